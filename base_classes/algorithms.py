@@ -1,13 +1,14 @@
 
 import copy
 import math
+import queue
 import random
 import time
-import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from rectangle_packer_classes.helpers import quick_copy
 
-from .types import OptimizationProblem, Solution, Neighborhood
+from .types import OptimizationProblem, Solution, Neighborhood, CancellationToken, ImprovementEvent, SolverStats, should_stop
 
 # """"""""FOR DEBUGGING""""""""
 #   import cProfile
@@ -28,12 +29,17 @@ class Greedy:
     Attributes:
         problem (OptimizationProblem): optimization problem instance that will be solved
         solution_type (type): type of the solution that will be generated for the optimization problem
+        instrument (bool): records counters and phase times of the run in stats
+        stats (SolverStats): statistics of the last run
     """
-    def __init__(self, problem: OptimizationProblem, solution_type: type, apply_greedy_strategy, strategy, in_test_env: bool):
+    def __init__(self, problem: OptimizationProblem, solution_type: type, apply_greedy_strategy, strategy, in_test_env: bool, instrument: bool = False):
         self.problem = problem
         self.solution_type = solution_type
-        self.problem.items = apply_greedy_strategy(self.problem.items, strategy)
+        self.problem.items = self.problem.sorted_items(strategy, apply_greedy_strategy)
         self.runs_ins_test_environment = in_test_env
+        self.instrument = instrument
+        self.stats = SolverStats(enabled=False)
+        self.interim_solutions = []
 
     def solve(self):
         """
@@ -41,27 +47,56 @@ class Greedy:
         Returns:
             Solution: Solution object containing the items applied to the problem
         """
+        for event in self.solve_iter():
+            pass
+        return event.solution, self.interim_solutions
+
+    def solve_iter(self, cancel_token: CancellationToken = None, deadline: float = None):
+        """
+        Runs the greedy approach step by step and yields an event after every placed group of items (see OptimizationProblem.group_items).
+        If the run is cancelled or the deadline passes, the partial solution is yielded as final event.
+
+        Args:
+            cancel_token (CancellationToken, optional): token to cancel the run
+            deadline (float, optional): absolute time (time.time()) at which the run stops
+
+        Yields:
+            ImprovementEvent: partial solutions without score, followed by the final event (also partial, if the run was stopped early)
+        """
         start_time = time.time()
 
         current_solution = self.solution_type()
+        self.stats = self.problem.stats = SolverStats(self.instrument)
         
-        interim_solutions = []
+        self.interim_solutions = []
+        complete = True
+        self.problem.start_construction(self.problem.items)
         
-        # iteratively add each item to the solution in greedy order (order already applied)
-        for item in self.problem.items:
-            # attempt to add the item to the current solution state
-            new_solution = self.problem.add_to_solution(current_solution, item)
+        # iteratively add each group of items to the solution in greedy order (order already applied)
+        for group in self.problem.group_items(self.problem.items):
+            if should_stop(cancel_token, deadline):
+                complete = False
+                break
+
+            # attempt to add the items to the current solution state
+            with self.stats.phase("placement"):
+                new_solution = self.problem.add_batch_to_solution(current_solution, group)
             if new_solution is not None:
                 # update current solution if the item was successfully added
                 current_solution = new_solution
                 if not self.runs_ins_test_environment:
-                    interim_solutions.append(quick_copy(current_solution))
+                    with self.stats.phase("copy"):
+                        self.interim_solutions.append(quick_copy(current_solution))
+                    self.stats.count("copies")
+                yield ImprovementEvent(current_solution, time.time() - start_time, complete=False)
 
+        with self.stats.phase("polish"):
+            current_solution = self.problem.polish_solution(current_solution)
         end_time = time.time()
         elapsed_time = end_time - start_time
         print(f"Laufzeit Greedy: {elapsed_time:.6f} Sekunden")
 
-        return current_solution, interim_solutions
+        yield ImprovementEvent(current_solution, elapsed_time, final=True, complete=complete, stopped=not complete, stats=self.stats)
 
 
 class LocalSearch:
@@ -73,14 +108,23 @@ class LocalSearch:
         start_solution (Solution): Initial solution to start the search from.
         max_iterations (int): Maximum number of iterations to perform.
         neighborhood (Neighborhood): Neighborhood structure to generate neighboring solutions.
+        num_neighbors (int): Number of neighbors generated per iteration, the best of them is taken (see Neighborhood.generate_neighbors).
+        max_workers (int, optional): Number of threads, that generate and evaluate the neighbors concurrently. Defaults to one per neighbor.
+        instrument (bool): Records counters and phase times of the run in stats.
+        stats (SolverStats): Statistics of the last run.
     """
     def __init__(self, problem: OptimizationProblem, start_solution: Solution, max_iterations: int,
-                 neighborhood: Neighborhood, in_test_env: bool):
+                 neighborhood: Neighborhood, in_test_env: bool, num_neighbors: int = 1, max_workers: int = None, instrument: bool = False):
         self.problem = problem
         self.start_solution = start_solution
         self.max_iterations = max_iterations
         self.neighborhood = neighborhood
         self.runs_ins_test_environment = in_test_env
+        self.num_neighbors = num_neighbors
+        self.max_workers = max_workers
+        self.instrument = instrument
+        self.stats = SolverStats(enabled=False)
+        self.interim_solutions = []
 
     def solve(self):
         """
@@ -92,38 +136,111 @@ class LocalSearch:
         Returns:
             Solution: The best solution found during the search process.
         """
+        for event in self.solve_iter():
+            pass
+        return event.solution, self.interim_solutions
+
+    def solve_iter(self, cancel_token: CancellationToken = None, deadline: float = None):
+        """
+        Runs the local search and yields an event for the start solution and for every accepted neighbor.
+        If the run is cancelled or the deadline passes, the best solution so far is yielded as final event.
+
+        Args:
+            cancel_token (CancellationToken, optional): token to cancel the run
+            deadline (float, optional): absolute time (time.time()) at which the run stops
+
+        Yields:
+            ImprovementEvent: improvements of the best solution, followed by the final event
+        """
         start_time = time.time()
+        self.stats = self.problem.stats = SolverStats(self.instrument)
         
-        interim_solutions = [quick_copy(self.start_solution)] if not self.runs_ins_test_environment else []
+        self.interim_solutions = [quick_copy(self.start_solution)] if not self.runs_ins_test_environment else []
 
         # intiialize the current and best solutions
         current_solution = self.start_solution
         best_solution = current_solution
         best_value = best_solution.evaluate_solution()
         iteration = 0
-
-        # perform local search for specified number of iterations
-        while iteration <= self.max_iterations:
-            # generate neighbor solution
-            neighbor = self.neighborhood.generate_neighbor(current_solution, interim_solutions, self.runs_ins_test_environment)
-            neighbor_value = neighbor.evaluate_solution()
-
-            # accept the neighbor if it is better or equal to current solution (side steps allowed )
-            if neighbor_value <= best_value and not current_solution.are_solutions_equal(neighbor):
-                current_solution = neighbor
-                best_solution = neighbor
-                best_value = neighbor_value
-                if not self.runs_ins_test_environment:
-                    interim_solutions.append(quick_copy(current_solution))
-
-            # move to the next iteration
-            iteration += 1
-
+        stopped = False
+        yield ImprovementEvent(best_solution, time.time() - start_time, best_value)
+
+        # the kernels of the neighborhoods release the GIL, so several neighbors can be generated on a thread pool
+        executor = None
+        if self.num_neighbors > 1:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers or self.num_neighbors)
+
+        try:
+            # perform local search for specified number of iterations
+            while iteration <= self.max_iterations:
+                if should_stop(cancel_token, deadline):
+                    stopped = True
+                    break
+
+                # generate neighbor solutions and continue with the best one
+                if executor is None:
+                    with self.stats.phase("neighbor"):
+                        neighbor = self.neighborhood.generate_neighbor(current_solution, self.interim_solutions, self.runs_ins_test_environment)
+                    with self.stats.phase("evaluation"):
+                        neighbor_value = neighbor.evaluate_solution()
+                    self.stats.count("moves_attempted")
+                else:
+                    # the neighbors are generated and evaluated together on the pool
+                    with self.stats.phase("neighbor"):
+                        neighbors = self.neighborhood.generate_neighbors(current_solution, self.num_neighbors, self.interim_solutions, 
+                                                                         self.runs_ins_test_environment, executor)
+                    neighbor_value, neighbor = min(neighbors, key=lambda pair: pair[0])
+                    self.stats.count("moves_attempted", len(neighbors))
+                improving = neighbor_value < best_value
+
+                # in-place neighbors changed the current solution itself, they are kept or undone without any copy.
+                # a failed move leaves the solution unchanged and is not accepted as side step
+                if self.neighborhood.in_place:
+                    if neighbor_value <= best_value and self.neighborhood.has_changes(neighbor):
+                        self.neighborhood.commit(neighbor)
+                        self.stats.count("moves_accepted")
+                        self.stats.count("moves_improving", improving)
+                        best_value = neighbor_value
+                        if not self.runs_ins_test_environment:
+                            with self.stats.phase("copy"):
+                                self.interim_solutions.append(quick_copy(current_solution))
+                            self.stats.count("copies")
+                        yield ImprovementEvent(best_solution, time.time() - start_time, best_value)
+                    else:
+                        with self.stats.phase("revert"):
+                            self.neighborhood.revert(neighbor)
+
+                # accept the neighbor if it is better or equal to current solution (side steps allowed )
+                elif neighbor_value <= best_value and not self.solutions_equal(current_solution, neighbor):
+                    current_solution = neighbor
+                    best_solution = neighbor
+                    best_value = neighbor_value
+                    self.stats.count("moves_accepted")
+                    self.stats.count("moves_improving", improving)
+                    if not self.runs_ins_test_environment:
+                        with self.stats.phase("copy"):
+                            self.interim_solutions.append(quick_copy(current_solution))
+                        self.stats.count("copies")
+                    yield ImprovementEvent(best_solution, time.time() - start_time, best_value)
+
+                # move to the next iteration
+                iteration += 1
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        with self.stats.phase("polish"):
+            best_solution = self.problem.polish_solution(best_solution)
         end_time = time.time()
         elapsed_time = end_time - start_time
         print(f"Laufzeit LocalSearch: {elapsed_time:.6f} Sekunden")
 
-        return best_solution, interim_solutions
+        yield ImprovementEvent(best_solution, elapsed_time, best_value, final=True, stopped=stopped, stats=self.stats)
+
+    def solutions_equal(self, solution: Solution, other: Solution):
+        """Compares two solutions and records the time of the check."""
+        with self.stats.phase("equality"):
+            return solution.are_solutions_equal(other)
 
 
 class SimulatedAnnealing:
@@ -139,10 +256,12 @@ class SimulatedAnnealing:
         iterations_per_temp (int): Number of iterations per temperature step.
         neighborhood_strategy (Neighborhood): Neighborhood structure to generate neighboring solutions.
         max_time (float): Maximum time allowed for the algorithm.
+        instrument (bool): Records counters and phase times of the run in stats.
+        stats (SolverStats): Statistics of the last run.
     """
     def __init__(self, problem: OptimizationProblem, start_solution: Solution,
                  initial_temperature: float, end_temperature: float, cooling_rate: float,
-                 iterations_per_temp: int, neighborhood_strategy: Neighborhood, max_time: float = 10.0, in_test_env: bool = False):
+                 iterations_per_temp: int, neighborhood_strategy: Neighborhood, max_time: float = 10.0, in_test_env: bool = False, instrument: bool = False):
         self.problem = problem
         self.start_solution = start_solution
         self.initial_temperature = initial_temperature
@@ -152,6 +271,9 @@ class SimulatedAnnealing:
         self.neighborhood_strategy = neighborhood_strategy
         self.runs_ins_test_environment = in_test_env
         self.max_time = max_time
+        self.instrument = instrument
+        self.stats = SolverStats(enabled=False)
+        self.interim_solutions = []
 
     def solve(self):
         """
@@ -164,52 +286,94 @@ class SimulatedAnnealing:
         Returns:
             Solution: The best solution found during the search process.
         """
+        for event in self.solve_iter():
+            pass
+        return event.solution, self.interim_solutions
+
+    def solve_iter(self, cancel_token: CancellationToken = None, deadline: float = None):
+        """
+        Runs the annealing process and yields an event for the start solution and for every new best solution.
+        The run stops after max_time, when it is cancelled or when the deadline passes, whichever comes first.
+
+        Args:
+            cancel_token (CancellationToken, optional): token to cancel the run
+            deadline (float, optional): absolute time (time.time()) at which the run stops
+
+        Yields:
+            ImprovementEvent: improvements of the best solution, followed by the final event
+        """
         start_time = time.time()
+        self.stats = self.problem.stats = SolverStats(self.instrument)
         
-        interim_solutions = [self.start_solution]
-
-        # Initiliaze the current and best solutions
+        # Initiliaze the current and best solutions. In-place neighborhoods change the current solution, so the best one is a copy
         current_solution = self.start_solution
-        best_solution = current_solution
+        best_solution = quick_copy(current_solution) if self.neighborhood_strategy.in_place else current_solution
         best_value = best_solution.evaluate_solution()
+        self.interim_solutions = [best_solution]
         temperature = self.initial_temperature
+        yield ImprovementEvent(best_solution, time.time() - start_time, best_value)
 
         # perform the annealing process until the temperature drops below the threshold
         while temperature > self.end_temperature:
             # perform multiple iteartions at the current temperature level
             for _ in range(self.iterations_per_temp):
                 elapsed_time = time.time()-start_time
-                # terminate if maximum allowed time is exceeded
-                if (elapsed_time >= self.max_time):
+                # terminate if maximum allowed time is exceeded, max_time is the own budget of the run and does not count as early stop
+                stopped = should_stop(cancel_token, deadline)
+                if elapsed_time >= self.max_time or stopped:
+                    with self.stats.phase("polish"):
+                        best_solution = self.problem.polish_solution(best_solution)
                     end_time = time.time()
                     elapsed_time = end_time - start_time
                     print(f"Laufzeit Simulated Annealing: {elapsed_time:.6f} Sekunden")
-                    return best_solution, interim_solutions
+                    yield ImprovementEvent(best_solution, elapsed_time, best_value, final=True, stopped=stopped, stats=self.stats)
+                    return
                 
                 # generate a neighboring solution
-                neighbor = self.neighborhood_strategy.generate_neighbor(current_solution, interim_solutions, self.runs_ins_test_environment)
-                neighbor_value = neighbor.evaluate_solution()
+                with self.stats.phase("neighbor"):
+                    neighbor = self.neighborhood_strategy.generate_neighbor(current_solution, self.interim_solutions, self.runs_ins_test_environment)
+                with self.stats.phase("evaluation"):
+                    neighbor_value = neighbor.evaluate_solution()
+                self.stats.count("moves_attempted")
 
                 # calculate change in objective value
                 delta = neighbor_value - best_value
 
-                # accept neighbor if it improves the solution or its with a certain probability
+                # accept neighbor if it improves the solution or its with a certain probability, unchanged in-place neighbors are skipped
+                if not self.neighborhood_strategy.has_changes(neighbor):
+                    continue
                 if delta <= 0 or random.uniform(0, 1) < math.exp(-delta / temperature):
                     current_solution = neighbor
+                    self.neighborhood_strategy.commit(neighbor)
+                    self.stats.count("moves_accepted")
                     if not self.runs_ins_test_environment:
-                        interim_solutions.append(quick_copy(neighbor))
-                    # update the best solution if the neighbor is better
+                        with self.stats.phase("copy"):
+                            self.interim_solutions.append(quick_copy(neighbor))
+                        self.stats.count("copies")
+                    # update the best solution if the neighbor is better, in-place neighbors are copied only then
                     if neighbor_value < best_value:
-                        best_solution = neighbor
+                        self.stats.count("moves_improving")
+                        if self.neighborhood_strategy.in_place:
+                            with self.stats.phase("copy"):
+                                best_solution = quick_copy(neighbor)
+                            self.stats.count("copies")
+                        else:
+                            best_solution = neighbor
                         best_value = neighbor_value
+                        yield ImprovementEvent(best_solution, time.time() - start_time, best_value)
+                else:
+                    with self.stats.phase("revert"):
+                        self.neighborhood_strategy.revert(neighbor)
 
             # cool down the temperature according to the cooling rate
             temperature *= self.cooling_rate
 
+        with self.stats.phase("polish"):
+            best_solution = self.problem.polish_solution(best_solution)
         end_time = time.time()
         elapsed_time = end_time - start_time
         print(f"Laufzeit Simulated Annealing: {elapsed_time:.6f} Sekunden")
-        return best_solution, interim_solutions
+        yield ImprovementEvent(best_solution, elapsed_time, best_value, final=True, stats=self.stats)
 
 
 class Backtracking:
@@ -219,13 +383,16 @@ class Backtracking:
     Attributes:
         problem (OptimizationProblem): The optimization problem instance.
         solution_type (type): Type of the solution used in the problem.
+        instrument (bool): Records counters and phase times of the run in stats.
+        stats (SolverStats): Statistics of the last run.
     """
-    def __init__(self, problem: OptimizationProblem, solution_type: type, in_test_env: bool):
+    def __init__(self, problem: OptimizationProblem, solution_type: type, in_test_env: bool, instrument: bool = False):
         self.problem = problem
         self.solution_type = solution_type
         self.interim_solutions = []
         self.runs_ins_test_environment = in_test_env
-        sys.setrecursionlimit(10 ** 6)
+        self.instrument = instrument
+        self.stats = SolverStats(enabled=False)
 
     def solve(self):
         """
@@ -238,54 +405,222 @@ class Backtracking:
         Returns:
             Solution: The first complete and valid solution found.
         """
+        for event in self.solve_iter():
+            pass
+        return event.solution, self.interim_solutions
+
+    def solve_iter(self, cancel_token: CancellationToken = None, deadline: float = None):
+        """
+        Runs the backtracking and yields an event after every placed item.
+        If the run is cancelled or the deadline passes, the partial solution is yielded as final event.
+
+        Args:
+            cancel_token (CancellationToken, optional): token to cancel the run
+            deadline (float, optional): absolute time (time.time()) at which the run stops
+
+        Yields:
+            ImprovementEvent: partial solutions without score, followed by the final event (also partial, if the run was stopped early)
+        """
         start_time = time.time()
         self.interim_solutions = []
+        self.stats = self.problem.stats = SolverStats(self.instrument)
 
         # intitialize an empty solution
         current_solution = self.solution_type()
-
-        # start the recursive backtracking process
-        result = self._backtrack(current_solution, 0)
-
-        copy_interim = self.interim_solutions
-
+        self.problem.start_construction(self.problem.items)
+
+        # start the backtracking process, each step yields the partial solution it has extended
+        steps = self._backtrack(current_solution, 0)
+        result = None
+        complete = True
+        while True:
+            if should_stop(cancel_token, deadline):
+                result = current_solution
+                complete = False
+                break
+            try:
+                current_solution = next(steps)
+            except StopIteration as finished:
+                result = finished.value
+                break
+            yield ImprovementEvent(current_solution, time.time() - start_time, complete=False)
+
+        with self.stats.phase("polish"):
+            result = self.problem.polish_solution(result)
         end_time = time.time()
         elapsed_time = end_time - start_time
         print(f"Laufzeit Backtracking: {elapsed_time:.6f} Sekunden")
 
-        return result, copy_interim
+        yield ImprovementEvent(result, elapsed_time, final=True, complete=complete, stopped=not complete, stats=self.stats)
 
     def _backtrack(self, current_solution: Solution, index: int):
         """
-        Recursive helper method for the Backtracking algorithm.
+        Helper generator for the Backtracking algorithm.
         
         It incrementally builds the solution by exploring one decision at a time 
-        and recursively backtracks if the current partial solution is not feasible.
+        and backtracks if the current partial solution is not feasible. 
+        The decisions are kept on an explicit stack instead of the call stack, 
+        so every extended partial solution can be yielded to the caller.
         
         Args:
             current_solution (Solution): The current partial solution state.
             index (int): Index of the item to be considered in the current step.
         
+        Yields:
+            Solution: every partial solution that was extended by one item.
+
         Returns:
             Solution: The first complete and valid solution found, or None if no solution is found.
         """
-        # base case: if all items are processed, return the current solution
-        if index >= len(self.problem.items):
-            return current_solution
+        stack = [(current_solution, index)]
+
+        while stack:
+            current_solution, index = stack.pop()
+
+            # base case: if all items are processed, return the current solution
+            if index >= len(self.problem.items):
+                return current_solution
+            
+            # get the next item to be placed in the solution
+            item = self.problem.items[index]
+            
+            # attempt to add item to current solution
+            with self.stats.phase("placement"):
+                new_solution = self.problem.add_to_solution(current_solution, item)
+
+            # if item was successfully added, continue with the next item
+            if new_solution is not None:
+                if not self.runs_ins_test_environment:
+                    with self.stats.phase("copy"):
+                        self.interim_solutions.append(quick_copy(new_solution))
+                    self.stats.count("copies")
+                yield new_solution
+                stack.append((new_solution, index + 1))
+
+        # backtrack if no valid solution is found
+        return None
+
+
+class Portfolio:
+    """
+    Portfolio solver that races several solvers on a worker pool under one shared wall-clock budget.
+    Every member is built by its own factory, so members never share mutable problem state.
+    
+    Attributes:
+        members (dict[str, function]): factories without arguments, that build a solver providing solve_iter()
+        time_limit (float): wall-clock budget in seconds for the whole portfolio
+        target_reached (function, optional): predicate on a solution, that returns True if it can not be improved anymore (e.g. a lower bound is reached). The remaining members are cancelled then.
+        max_workers (int, optional): size of the worker pool. Defaults to one worker per member.
+        member_results (list[dict]): score, solution, runtime, status and stats of every member of the last run
+        interim_solutions (list[Solution]): final solutions of the members of the last run, from the worst to the best score
+    """
+    def __init__(self, members: dict, time_limit: float, target_reached=None, max_workers: int = None):
+        self.members = members
+        self.time_limit = time_limit
+        self.target_reached = target_reached
+        self.max_workers = max_workers
+        self.member_results = []
+        self.interim_solutions = []
+
+    def solve(self):
+        """
+        Runs all members concurrently and returns the best solution found by any of them.
         
-        # get the next item to be placed in the solution
-        item = self.problem.items[index]
+        Returns:
+            tuple: (best_solution, member_results) where member_results holds one dict per member with its score, solution, runtime, status and the stats of instrumented members
+        """
+        for event in self.solve_iter():
+            pass
+        return event.solution, self.member_results
+
+    def solve_iter(self, cancel_token: CancellationToken = None, deadline: float = None):
+        """
+        Runs all members concurrently and yields an event every time a member reports a new overall best score.
+        The members share one cancellation token, which is cancelled when the target is reached, 
+        when the caller cancels the portfolio or when the portfolio iterator is closed.
+
+        Args:
+            cancel_token (CancellationToken, optional): token to cancel the whole portfolio
+            deadline (float, optional): absolute time (time.time()) at which the run stops, if it is earlier than the time limit
+
+        Yields:
+            ImprovementEvent: improvements of the best solution over all members, followed by the final event
+        """
+        start_time = time.time()
+        members_deadline = start_time + self.time_limit
+        if deadline is not None:
+            members_deadline = min(members_deadline, deadline)
         
-        # attempt to add item to current solution
-        new_solution = self.problem.add_to_solution(current_solution, item)
+        members_token = CancellationToken()
+        reported = queue.Queue()
+        self.member_results = []
+        self.interim_solutions = []
 
-        # if item was successfully added, continue with the next item
-        if new_solution is not None:
-            if not self.runs_ins_test_environment:
-                self.interim_solutions.append(quick_copy(new_solution))
-            result = self._backtrack(new_solution, index + 1)
-            if result is not None:
-                return result # return the first valid complete solution found
+        def run_member(name, factory):
+            result = {"member": name, "score": None, "solution": None, "time": 0.0, "status": "finished"}
+            member_start = time.time()
+            event = None
+            try:
+                # building a member (e.g. its start solution) counts against the budget, so it is not started once the budget is used up
+                if not should_stop(members_token, members_deadline):
+                    solver = factory()
+                    if not should_stop(members_token, members_deadline):
+                        for event in solver.solve_iter(members_token, members_deadline):
+                            # partial solutions of constructive algorithms have no score and are not comparable.
+                            # members with in-place neighborhoods keep changing their solution, so improvements are copied
+                            if event.score is not None:
+                                reported.put((event.score, event.solution if event.final else quick_copy(event.solution)))
+                        result["score"], result["solution"] = event.score, event.solution
+                        if event.stats is not None and event.stats.enabled:
+                            result["stats"] = event.stats.as_dict()
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = repr(e)
+            result["time"] = time.time() - member_start
+            
+            # only members, that did not run or were stopped early, count as cancelled or timed out
+            if result["status"] == "finished" and (event is None or event.stopped):
+                result["status"] = "cancelled" if members_token.cancelled else "timeout"
+            return result
+
+        best_solution, best_value = None, None
+        executor = ThreadPoolExecutor(max_workers=self.max_workers or len(self.members))
+        try:
+            futures = [executor.submit(run_member, name, factory) for name, factory in self.members.items()]
+            pending = futures
+            
+            # collect reported scores until every member has finished, partial solutions of stopped members have no score
+            while pending or not reported.empty():
+                if should_stop(cancel_token):
+                    members_token.cancel()
+                try:
+                    score, solution = reported.get(timeout=0.05)
+                except queue.Empty:
+                    pending = [future for future in pending if not future.done()]
+                    continue
+                
+                if best_value is None or score < best_value:
+                    best_solution, best_value = solution, score
+                    # cancel the stragglers, if the best solution can not be improved anymore
+                    if self.target_reached is not None and self.target_reached(solution):
+                        members_token.cancel()
+                    yield ImprovementEvent(best_solution, time.time() - start_time, best_value)
+        finally:
+            members_token.cancel()
+            executor.shutdown(wait=True)
+
+        self.member_results = [future.result() for future in futures]
+        
+        # the final solution of each member is its best one, so the overall best is taken from those
+        finished = [result for result in self.member_results if result["score"] is not None]
+        if finished:
+            best = min(finished, key=lambda result: result["score"])
+            best_solution, best_value = best["solution"], best["score"]
+        # the results of the members are kept as steps, partial solutions of stopped constructive members have no score and are left out
+        self.interim_solutions = [result["solution"] for result in sorted(finished, key=lambda result: result["score"])][::-1]
 
-        # backtrack if no valid solution is found
-        return None
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        print(f"Laufzeit Portfolio: {elapsed_time:.6f} Sekunden")
+        stopped = should_stop(cancel_token) or any(result["status"] == "timeout" for result in self.member_results)
+        yield ImprovementEvent(best_solution, elapsed_time, best_value, final=True, stopped=stopped)
@@ -1,10 +1,88 @@
+import threading
+import time
 from abc import ABC, abstractmethod
 
+# =================================================
+#                 Instrumentation
+# =================================================
+
+class SolverStats:
+    """
+    Counters and phase timers of a solver run (e.g. moves attempted, placement calls, time spent copying).
+    A disabled instance ignores every call, so the instrumentation can stay in the code with almost no overhead.
+
+    Attributes:
+        enabled (bool): if False, nothing is recorded
+        counters (dict[str, int]): counter values by name
+        timers (dict[str, float]): seconds spent in every phase
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.counters = {}
+        self.timers = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"SolverStats(enabled={self.enabled}, counters={self.counters}, timers={self.timers})"
+
+    def count(self, name: str, amount: int = 1):
+        """Increases a counter."""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+    def phase(self, name: str):
+        """Returns a context manager, that adds the time spent in its with-block to the timer of the phase."""
+        if not self.enabled:
+            return _NO_PHASE
+        return _PhaseTimer(self, name)
+
+    def add_time(self, name: str, seconds: float):
+        """Adds time to the timer of a phase."""
+        if self.enabled:
+            with self._lock:
+                self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: copies of the counters and timers, e.g. for a JSON protocol
+        """
+        with self._lock:
+            return {"counters": dict(self.counters), "timers": {name: round(seconds, 6) for name, seconds in self.timers.items()}}
+
+
+class _PhaseTimer:
+    def __init__(self, stats: SolverStats, name: str):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, time.perf_counter() - self.start_time)
+        return False
+
+
+class _NoPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_PHASE = _NoPhase()
+
 # =================================================
 #               OptimizationProblem
 # =================================================
 
 class OptimizationProblem(ABC):
+    # statistics of the running solver, the solvers attach their own instance (see SolverStats)
+    stats = SolverStats(enabled=False)
+
     @abstractmethod
     def add_to_solution(self, *args):
         pass
@@ -12,15 +90,123 @@ class OptimizationProblem(ABC):
     @abstractmethod
     def find_valid_assignment(self, *args):
         pass
+
+    def start_construction(self, items):
+        """
+        Hook, that is called by constructive algorithms before they add the given items to a new solution one by one.
+        Problems can use it to prepare bookkeeping for the pass, by default nothing happens.
+        """
+        pass
+
+    def sorted_items(self, order_name, apply_order):
+        """
+        Returns the items of the problem in the given order. By default the order function is applied to the items,
+        problems can override it to reuse orders that were computed before.
+
+        Args:
+            order_name (str): name of the order (e.g. a greedy strategy)
+            apply_order (function): function that sorts a list of items by the order name
+        """
+        return apply_order(self.items, order_name)
+
+    def group_items(self, items):
+        """
+        Splits the items into consecutive groups, that constructive algorithms add to a solution in one step.
+        By default every item is its own group.
+        """
+        return [[item] for item in items]
+
+    def add_batch_to_solution(self, solution, items):
+        """
+        Adds a group of items from group_items() to the solution. By default they are added one by one.
+        """
+        for item in items:
+            new_solution = self.add_to_solution(solution, item)
+            if new_solution is not None:
+                solution = new_solution
+        return solution
+
+    def polish_solution(self, solution):
+        """
+        Hook, that is called by the algorithms with their final solution, before it is reported.
+        Problems can improve the solution without changing its score (e.g. compact it), by default it is returned unchanged.
+        """
+        return solution
     
 # =================================================
 #                 Neighborhood
 # =================================================
     
 class Neighborhood(ABC):
+    # in-place neighborhoods change the given solution and keep an undo log, instead of returning a modified copy
+    in_place = False
+    # deterministic neighborhoods always generate the same neighbor for the same solution and state
+    deterministic = False
+    # neighborhoods that change the given solution without an undo log, the search continues from their result in any case
+    changes_input = False
+
     @abstractmethod
     def generate_neighbor(self, *args):
         pass
+
+    def revert(self, solution):
+        """
+        Undoes the last in-place neighbor of the solution, after the algorithm rejected it. Nothing happens by default.
+        """
+        pass
+
+    def commit(self, solution):
+        """
+        Accepts the last in-place neighbor of the solution, so its undo log can be dropped. Nothing happens by default.
+        """
+        pass
+
+    def has_changes(self, solution):
+        """
+        Checks if the last in-place neighbor changed the solution at all. Algorithms do not accept an unchanged solution
+        as side step. By default every neighbor counts as changed.
+        """
+        return True
+
+    def generate_neighbors(self, solution, count, interim_solutions, test_environment=False, executor=None):
+        """
+        Generates and evaluates several neighbors of the same solution, so an algorithm can continue with the best of them.
+        If an executor is given, the neighbors are generated and evaluated concurrently, so generate_neighbor must not change shared state.
+        In-place and deterministic neighborhoods generate a single neighbor, since more of them would change the same solution
+        or be identical.
+
+        Args:
+            solution (Solution): current solution
+            count (int): number of neighbors
+            interim_solutions (list[Solution]): list of interim solutions for the UI
+            test_environment (bool, optional): skips the interim solutions. Defaults to False.
+            executor (Executor, optional): pool, that generates and evaluates the neighbors concurrently
+
+        Returns:
+            list[tuple[float, Solution]]: score and neighbor of every generated neighbor
+        """
+        if self.in_place or self.deterministic or count <= 1:
+            return [self.scored_neighbor(solution, interim_solutions, test_environment)]
+        if executor is None:
+            return [self.scored_neighbor(solution, interim_solutions, test_environment) for _ in range(count)]
+
+        # interim solutions are collected per neighbor and appended in order
+        interim_lists = [[] for _ in range(count)]
+        futures = [executor.submit(self.scored_neighbor, solution, interim_list, test_environment) for interim_list in interim_lists]
+        neighbors = [future.result() for future in futures]
+        for interim_list in interim_lists:
+            interim_solutions.extend(interim_list)
+        return neighbors
+
+    def scored_neighbor(self, solution, interim_solutions, test_environment=False):
+        """
+        Generates a neighbor and evaluates it in the same task, so a pool can run both concurrently.
+
+        Returns:
+            tuple[float, Solution]: score of the neighbor and the neighbor
+        """
+        neighbor = self.generate_neighbor(solution, interim_solutions, test_environment)
+        return neighbor.evaluate_solution(), neighbor
     
 # =================================================
 #             Item, Container, Solution
@@ -33,4 +219,78 @@ class Container(ABC):
     pass
 
 class Solution(ABC):
-    pass
\ No newline at end of file
+    pass
+
+# =================================================
+#                 Anytime solving
+# =================================================
+
+class CancellationToken:
+    """
+    Thread-safe flag that allows a caller to stop a running solve_iter() cleanly.
+    The algorithm finishes its current step and yields its best solution so far.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Requests the cancellation of every run that observes this token."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def __repr__(self):
+        return f"CancellationToken(cancelled={self.cancelled})"
+
+
+def should_stop(cancel_token: CancellationToken = None, deadline: float = None):
+    """Checks if a run has been cancelled or if its absolute deadline (in time.time() seconds) has passed.
+
+    Args:
+        cancel_token (CancellationToken, optional): token that may have been cancelled by the caller
+        deadline (float, optional): absolute point in time after which the run has to stop
+
+    Returns:
+        bool: True if the run has to stop, False otherwise
+    """
+    if cancel_token is not None and cancel_token.cancelled:
+        return True
+    return deadline is not None and time.time() >= deadline
+
+
+class ImprovementEvent:
+    """
+    Event yielded by the solve_iter() method of an algorithm.
+
+    Attributes:
+        solution (Solution): handle to the current best solution. It is not a copy, so it may change after the iteration continues
+        elapsed_time (float): seconds since the start of the run
+        final (bool): True for the last event of a run, which holds the returned solution
+        complete (bool): False for partial solutions of constructive algorithms, which do not contain every item yet
+        stopped (bool): True for the final event of a run, that was stopped early by its cancellation token or deadline
+        stats (SolverStats): statistics of the run, only set for the final event
+    """
+    def __init__(self, solution: Solution, elapsed_time: float, score: float = None, final: bool = False, complete: bool = True, 
+                 stopped: bool = False, stats: SolverStats = None):
+        self.solution = solution
+        self.elapsed_time = elapsed_time
+        self.final = final
+        self.complete = complete
+        self.stopped = stopped
+        self.stats = stats
+        self._score = score
+
+    @property
+    def score(self):
+        """
+        Evaluation of the solution. Partial solutions are not comparable and have no score (None),
+        the score of the final solution is only computed when it is requested.
+        """
+        if self._score is None and self.final and self.complete and self.solution is not None:
+            self._score = self.solution.evaluate_solution()
+        return self._score
+
+    def __repr__(self):
+        return f"ImprovementEvent(score={self._score}, elapsed_time={self.elapsed_time:.6f}, final={self.final}, complete={self.complete}, stopped={self.stopped})"
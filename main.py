@@ -1,14 +1,34 @@
+import functools
+import time
 import tkinter as tk
 
-from base_classes.algorithms import Greedy, LocalSearch, Backtracking, SimulatedAnnealing
-from rectangle_packer_classes.helpers import get_neighborhood_and_start_solution, merge_geometry_based_solutions, GreedyStrategy, Neighborhoods, apply_greedy_strategy
-from rectangle_packer_classes.problem_classes import RectanglePacker, RecPac_Solution
+from base_classes.algorithms import Greedy, LocalSearch, Backtracking, SimulatedAnnealing, Portfolio
+from base_classes.types import ImprovementEvent
+from rectangle_packer_classes.helpers import get_neighborhood_and_start_solution, merge_geometry_based_solutions, build_portfolio_members, fast_greedy, solve_by_decomposition, solve_sub_instance, GreedyStrategy, Neighborhoods, apply_greedy_strategy
+from rectangle_packer_classes.problem_classes import RectanglePacker, RecPac_Solution, PlacementPolicy
 from rectangle_packer_classes.rectangle_packer_viewer import RectanglePackerVisualizer
 
 
 def main():
+
+    def run_solver(solver, cancel_token=None, on_progress=None):
+        """
+        Drives the anytime iterator of a solver and forwards every event to the progress callback.
+
+        Args:
+            solver: algorithm instance that provides solve_iter()
+            cancel_token (CancellationToken, optional): token that stops the run early
+            on_progress (function, optional): callback that receives every ImprovementEvent
+
+        Returns:
+            tuple: (solution, interim_solutions) like solve()
+        """
+        for event in solver.solve_iter(cancel_token):
+            if on_progress is not None:
+                on_progress(event)
+        return event.solution, solver.interim_solutions
     
-    def greedy_runner(items, container_size, strategy_name):
+    def greedy_runner(items, container_size, strategy_name, placement_policy=PlacementPolicy.FIRST_FIT.value, cancel_token=None, on_progress=None):
         """
         Runs the greedy algorithm for rectangle packing.
 
@@ -16,16 +36,37 @@ def main():
             items (list[Rectangle]): List of the rectangles that will be packed into the containers
             container_size (int): Size of the container box 
             strategy_name (str): Name of the greedy strategy that will be used
+            placement_policy (str, optional): Name of the box selection (first or tightest fitting box). Defaults to first fit
+            cancel_token (CancellationToken, optional): token that stops the run early
+            on_progress (function, optional): callback that receives every ImprovementEvent
 
         Returns:
             RecPac_Solution: Object that represents a solution for the rectangle packer.
         """
-        problem = RectanglePacker(items, container_size)
+        problem = RectanglePacker(items, container_size, PlacementPolicy(placement_policy))
         greedy_solver = Greedy(problem, RecPac_Solution, apply_greedy_strategy, strategy_name, False)
-        end_solution, interim_solutions = greedy_solver.solve()
-        return end_solution, interim_solutions
+        return run_solver(greedy_solver, cancel_token, on_progress)
 
-    def local_search_runner(items, container_size, neighborhood_name, strategy_rulebased, max_iterations=21):
+    def start_solution_runner(items, container_size, strategy_name, placement_policy=PlacementPolicy.FIRST_FIT.value):
+        """
+        Builds the greedy start solutions of the other algorithms. With first fit the compiled fast path is used,
+        it places the rectangles exactly like the greedy algorithm, but records no interim solutions.
+
+        Args:
+            items (list[Rectangle]): List of the rectangles that will be packed into the containers
+            container_size (int): Size of the container box 
+            strategy_name (str): Name of the greedy strategy that will be used
+            placement_policy (str, optional): Name of the box selection (first or tightest fitting box). Defaults to first fit
+
+        Returns:
+            tuple: (solution, interim_solutions) like greedy_runner
+        """
+        if PlacementPolicy(placement_policy) == PlacementPolicy.FIRST_FIT:
+            return fast_greedy(items, container_size, strategy_name), []
+        return greedy_runner(items, container_size, strategy_name, placement_policy)
+
+    def local_search_runner(items, container_size, neighborhood_name, strategy_rulebased, max_iterations=21, num_neighbors=1, max_workers=None, 
+                            placement_policy=PlacementPolicy.FIRST_FIT.value, cancel_token=None, on_progress=None):
         """
         Runs the local search algorithm for rectangle packing.
 
@@ -35,38 +76,46 @@ def main():
             neighborhood_name (str): Name of the chosen neighborhood strategy
             strategy_rulebased (str): Chosen strategy that will be used, when the neighborhood 'rule-based' is chosen
             max_iterations (int, optional): Maximum number of iterations for local search. Defaults to 21
+            num_neighbors (int, optional): Number of neighbors per iteration, the best one is taken. Defaults to 1
+            max_workers (int, optional): Number of threads for the neighbors. Defaults to one per neighbor
+            placement_policy (str, optional): Name of the box selection (first or tightest fitting box). Defaults to first fit
+            cancel_token (CancellationToken, optional): token that stops the run early
+            on_progress (function, optional): callback that receives every ImprovementEvent
 
         Returns:
             RecPac_Solution: Object that represents a solution for the rectangle packer.
         """
-        problem = RectanglePacker(items, container_size)
+        problem = RectanglePacker(items, container_size, PlacementPolicy(placement_policy))
+        start_runner = functools.partial(start_solution_runner, placement_policy=placement_policy)
         
         # determine start solution and neighborhood strategy based on neighborhood. If its the geometery based neighborhood, it will generate the start_solution differently, to get better results
         if neighborhood_name == Neighborhoods.GEOMETRY.value:
-            start_solution, neighborhood = merge_geometry_based_solutions(problem, neighborhood_name, items, container_size, strategy_rulebased, greedy_runner)
+            start_solution, neighborhood = merge_geometry_based_solutions(problem, neighborhood_name, items, container_size, strategy_rulebased, start_runner)
         else:
-            start_solution, neighborhood = get_neighborhood_and_start_solution(problem, neighborhood_name, items, container_size, strategy_rulebased, greedy_runner)
-        local_search_solver = LocalSearch(problem, start_solution, max_iterations, neighborhood, False)
-        solution, interim_solutions = local_search_solver.solve()
-        return solution, interim_solutions
+            start_solution, neighborhood = get_neighborhood_and_start_solution(problem, neighborhood_name, items, container_size, strategy_rulebased, start_runner)
+        local_search_solver = LocalSearch(problem, start_solution, max_iterations, neighborhood, False, num_neighbors=num_neighbors, max_workers=max_workers)
+        return run_solver(local_search_solver, cancel_token, on_progress)
 
-    def backtracking_runner(items, container_size):
+    def backtracking_runner(items, container_size, placement_policy=PlacementPolicy.FIRST_FIT.value, cancel_token=None, on_progress=None):
         """
         Runs Backtracking algorithm for rectangle packing.
         
         Args:
             items (list[Rectangle]): List of the rectangles that will be packed into the containers
             container_size (int): Size of the container box
+            placement_policy (str, optional): Name of the box selection (first or tightest fitting box). Defaults to first fit
+            cancel_token (CancellationToken, optional): token that stops the run early
+            on_progress (function, optional): callback that receives every ImprovementEvent
         
         Returns:
             RecPac_Solution: Object that represents a solution for the rectangle packer.
         """
-        problem = RectanglePacker(items, container_size)
+        problem = RectanglePacker(items, container_size, PlacementPolicy(placement_policy))
         backtracking_solver = Backtracking(problem ,RecPac_Solution, False)
-        solution, interim_solutions = backtracking_solver.solve()
-        return solution, interim_solutions
+        return run_solver(backtracking_solver, cancel_token, on_progress)
 
-    def simulated_annealing_runner(items, container_size, neighborhood_name=Neighborhoods.GEOMETRY.value, strategy_rulebased="", initial_temperature=1000, end_temperature=25, cooling_rate=0.95, iterations_per_temp=10, max_time=10):
+    def simulated_annealing_runner(items, container_size, neighborhood_name=Neighborhoods.GEOMETRY.value, strategy_rulebased="", initial_temperature=1000, end_temperature=25, cooling_rate=0.95, iterations_per_temp=10, max_time=10, 
+                                   placement_policy=PlacementPolicy.FIRST_FIT.value, cancel_token=None, on_progress=None):
         """
         Runs Simulated Annealing algorithm for rectangle packing.
         
@@ -80,13 +129,20 @@ def main():
             cooling_rate (float): Cooling rate for temperature reduction.
             iterations_per_temp (int): Amount of iterations, that the temperature will be constant for.
             max_time (int): Maximum allowed time for the algorithm.
+            placement_policy (str, optional): Name of the box selection (first or tightest fitting box). Defaults to first fit
+            cancel_token (CancellationToken, optional): token that stops the run early
+            on_progress (function, optional): callback that receives every ImprovementEvent
         
         Returns:
             RecPac_Solution: Object that represents a solution for the rectangle packer.
         """
-        problem = RectanglePacker(items, container_size)
+        problem = RectanglePacker(items, container_size, PlacementPolicy(placement_policy))
+        start_runner = functools.partial(start_solution_runner, placement_policy=placement_policy)
 
-        start_solution, neighborhood = merge_geometry_based_solutions(problem, neighborhood_name, items, container_size, strategy_rulebased, greedy_runner)
+        if neighborhood_name == Neighborhoods.GEOMETRY.value:
+            start_solution, neighborhood = merge_geometry_based_solutions(problem, neighborhood_name, items, container_size, strategy_rulebased, start_runner)
+        else:
+            start_solution, neighborhood = get_neighborhood_and_start_solution(problem, neighborhood_name, items, container_size, strategy_rulebased, start_runner)
 
         simulated_annealing_solver = SimulatedAnnealing(
             problem=problem,
@@ -99,13 +155,59 @@ def main():
             in_test_env=False,
             max_time=max_time
         )
-        solution, interim_solutions = simulated_annealing_solver.solve()
-        return solution, interim_solutions
+        return run_solver(simulated_annealing_solver, cancel_token, on_progress)
+
+    def portfolio_runner(items, container_size, max_time=10, max_iterations=21, placement_policy=PlacementPolicy.FIRST_FIT.value, cancel_token=None, on_progress=None):
+        """
+        Runs all greedy strategies and local search neighborhoods concurrently and keeps the best solution.
+        The run stops early, if a member reaches the lower bound for the number of boxes with a valid solution (without overlaps).
 
+        Args:
+            items (list[Rectangle]): List of the rectangles that will be packed into the containers
+            container_size (int): Size of the container box
+            max_time (int): Wall-clock budget for the whole portfolio.
+            max_iterations (int, optional): Maximum number of iterations for the local search members. Defaults to 21
+            placement_policy (str, optional): Name of the box selection (first or tightest fitting box) of all members. Defaults to first fit
+            cancel_token (CancellationToken, optional): token that stops the run early
+            on_progress (function, optional): callback that receives every ImprovementEvent
+
+        Returns:
+            tuple: (solution, member_solutions) the best solution and the final solutions of the members from the worst to the best score
+        """
+        problem = RectanglePacker(items, container_size)
+        lower_bound = problem.lower_bound()
+        
+        start_runner = functools.partial(start_solution_runner, placement_policy=placement_policy)
+        members = build_portfolio_members(items, container_size, start_runner, max_iterations, PlacementPolicy(placement_policy))
+        portfolio_solver = Portfolio(members, max_time, target_reached=lambda solution: len(solution.boxes) <= lower_bound and solution.is_feasible())
+        return run_solver(portfolio_solver, cancel_token, on_progress)
     
+    def decomposition_runner(items, container_size, strategy_name, placement_policy=PlacementPolicy.FIRST_FIT.value, cancel_token=None, on_progress=None):
+        """
+        Runs the decomposition for large instances: the rectangles are split into sub instances, which are solved 
+        with the greedy algorithm in worker processes, merged and repaired. The run can not be cancelled, it only takes a single greedy pass.
+
+        Args:
+            items (list[Rectangle]): List of the rectangles that will be packed into the containers
+            container_size (int): Size of the container box 
+            strategy_name (str): Name of the greedy strategy for the sub instances
+            placement_policy (str, optional): Name of the box selection (first or tightest fitting box). Defaults to first fit
+            cancel_token (CancellationToken, optional): not used, the decomposition runs until it is finished
+            on_progress (function, optional): callback that receives the final ImprovementEvent
+
+        Returns:
+            tuple: (solution, interim_solutions), the only interim solution is the final one
+        """
+        start = time.time()
+        sub_solver = functools.partial(solve_sub_instance, strategy_name=strategy_name, placement_policy=PlacementPolicy(placement_policy))
+        solution = solve_by_decomposition(items, container_size, sub_solver)
+        if on_progress is not None:
+            on_progress(ImprovementEvent(solution, time.time() - start, final=True))
+        return solution, [solution]
+
     # init tkinter root window and the visualizer application
     root = tk.Tk()
-    app = RectanglePackerVisualizer(root, greedy_runner, local_search_runner, backtracking_runner, simulated_annealing_runner)
+    app = RectanglePackerVisualizer(root, greedy_runner, local_search_runner, backtracking_runner, simulated_annealing_runner, portfolio_runner, decomposition_runner)
     root.mainloop()
 
 
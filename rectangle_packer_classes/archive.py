@@ -0,0 +1,357 @@
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from rectangle_packer_classes.problem_classes import Box, RecPac_Solution, Rectangle
+
+# =================================================
+#                 Binary archive format
+# =================================================
+#
+# A rectangle archive (.rpk) stores instances and solutions as int32 columns, so they can be loaded with np.memmap
+# instead of parsing a JSON dict per rectangle. All values are little endian.
+#
+#   file header:    magic "RPK1", format version, box length                          (3 x 4 bytes)
+#   every record:   number of rectangles n, number of boxes, length of the metadata   (3 x 4 bytes)
+#                   metadata as UTF-8 JSON, padded with spaces to a multiple of 4 bytes
+#                   int32 columns x, y, w, h, color, box of length n one after another (6 x n x 4 bytes)
+#
+# Records are only appended, so an archive can be extended while it is written. The metadata of a record contains
+# its kind ("instance" or "solution"), the color names referenced by the color column and any further information
+# (e.g. algorithm and strategy of a solution). Unplaced rectangles of an instance have the coordinates -1.
+
+ARCHIVE_EXTENSION = ".rpk"
+ARCHIVE_MAGIC = b"RPK1"
+ARCHIVE_VERSION = 1
+COLUMNS = ("x", "y", "w", "h", "color", "box")
+
+_FILE_HEADER = struct.Struct("<4sii")
+_RECORD_HEADER = struct.Struct("<iii")
+
+
+def is_archive(file_path):
+    """Checks by the file extension, if a file is a rectangle archive instead of JSON."""
+    return os.path.splitext(file_path)[1].lower() == ARCHIVE_EXTENSION
+
+
+def rectangles_to_columns(rectangles, box_ids=None):
+    """
+    Converts rectangles into the column layout of an archive record.
+
+    Args:
+        rectangles (list[Rectangle]): rectangles, unplaced ones have the coordinates None
+        box_ids (list[int], optional): index of the box of every rectangle. Defaults to -1 for all rectangles.
+
+    Returns:
+        tuple: (int32 array of shape (6, n), list of the color names referenced by the color column)
+    """
+    colors = {}
+    columns = np.full((len(COLUMNS), len(rectangles)), -1, dtype=np.int32)
+    for i, rect in enumerate(rectangles):
+        if rect.x is not None:
+            columns[0, i] = rect.x
+            columns[1, i] = rect.y
+        columns[2, i] = rect.width
+        columns[3, i] = rect.height
+        columns[4, i] = colors.setdefault(rect.color, len(colors))
+    if box_ids is not None:
+        columns[5] = box_ids
+    return columns, list(colors)
+
+
+def solution_to_columns(solution):
+    """
+    Converts the boxes of a solution into the column layout of an archive record.
+
+    Returns:
+        tuple: (int32 array of shape (6, n), list of color names, number of boxes)
+    """
+    rectangles = [rect for box in solution.boxes for rect in box.items]
+    box_ids = [box_id for box_id, box in enumerate(solution.boxes) for _ in box.items]
+    columns, colors = rectangles_to_columns(rectangles, box_ids)
+    return columns, colors, len(solution.boxes)
+
+
+def columns_to_rectangles(columns, colors):
+    """
+    Creates the rectangles of an archive record. Coordinates of -1 become None again.
+
+    Args:
+        columns (np.ndarray): int32 columns of the record
+        colors (list[str]): color names of the record
+
+    Returns:
+        list[Rectangle]: rectangles in the order of the record
+    """
+    # lists of python ints, so the rectangles do not carry numpy scalars into the numba kernels
+    xs, ys, widths, heights, color_ids, _ = columns.tolist()
+    return [
+        Rectangle(None if x < 0 else x, None if y < 0 else y, w, h, colors[c])
+        for x, y, w, h, c in zip(xs, ys, widths, heights, color_ids)
+    ]
+
+
+def columns_to_solution(columns, colors, box_length, num_boxes):
+    """
+    Creates a solution from an archive record, including empty boxes.
+
+    Args:
+        columns (np.ndarray): int32 columns of the record
+        colors (list[str]): color names of the record
+        box_length (int): side length of the boxes
+        num_boxes (int): number of boxes of the solution
+
+    Returns:
+        RecPac_Solution: the stored solution
+    """
+    boxes = [Box(box_length) for _ in range(num_boxes)]
+    for rect, box_id in zip(columns_to_rectangles(columns, colors), columns[5].tolist()):
+        boxes[box_id].add_item(rect)
+    solution = RecPac_Solution()
+    for box in boxes:
+        solution.add_box(box)
+    return solution
+
+
+class ArchiveWriter:
+    """
+    Appends instances and solutions to a rectangle archive. Every record is flushed after it is written,
+    so records of a long test run are kept on disk even if the process stops.
+
+    Attributes:
+        file_path (str): path of the archive
+        box_length (int): side length of the boxes of all records
+        records (int): number of records written by this writer
+    """
+    def __init__(self, file_path: str, box_length: int, append: bool = False):
+        self.file_path = file_path
+        self.box_length = int(box_length)
+        self.records = 0
+        if append and os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            stored_length = ArchiveReader.read_header(file_path)
+            if stored_length != self.box_length:
+                raise ValueError(f"Archive {file_path} has box length {stored_length}, not {self.box_length}")
+            self.file = open(file_path, "ab")
+        else:
+            self.file = open(file_path, "wb")
+            self.file.write(_FILE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, self.box_length))
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def write_record(self, columns, num_boxes: int, metadata: dict):
+        """
+        Appends a record.
+
+        Args:
+            columns (np.ndarray): columns of shape (6, n)
+            num_boxes (int): number of boxes, 0 for instances
+            metadata (dict): JSON serializable metadata, including the color names in "colors"
+        """
+        columns = np.ascontiguousarray(columns, dtype="<i4")
+        metadata_bytes = json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+        metadata_bytes += b" " * (-len(metadata_bytes) % 4)
+        self.file.write(_RECORD_HEADER.pack(columns.shape[1], num_boxes, len(metadata_bytes)))
+        self.file.write(metadata_bytes)
+        self.file.write(columns.tobytes())
+        self.file.flush()
+        self.records += 1
+
+    def write_instance(self, rectangles, metadata: dict = None):
+        """Appends a list of (unplaced) rectangles with optional metadata."""
+        columns, colors = rectangles_to_columns(rectangles)
+        self.write_record(columns, 0, {**(metadata or {}), "kind": "instance", "colors": colors})
+
+    def write_solution(self, solution, metadata: dict = None):
+        """Appends a solution with optional metadata (e.g. algorithm, strategy and neighborhood)."""
+        columns, colors, num_boxes = solution_to_columns(solution)
+        self.write_record(columns, num_boxes, {**(metadata or {}), "kind": "solution", "colors": colors})
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class ArchiveReader:
+    """
+    Reads a rectangle archive through np.memmap. Opening only scans the record headers, the columns of a record
+    are views into the mapped file and are not copied until rectangles or a solution are created from them.
+    A record, that was cut off while it was written, is ignored.
+
+    Attributes:
+        file_path (str): path of the archive
+        box_length (int): side length of the boxes of all records
+        offsets (list[tuple]): (metadata offset, metadata length, columns offset, number of rectangles, number of boxes) per record
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.box_length = self.read_header(file_path)
+        self.data = np.memmap(file_path, dtype=np.uint8, mode="r")
+        self.offsets = []
+        self.scan()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @staticmethod
+    def read_header(file_path: str):
+        """
+        Checks the file header of an archive.
+
+        Returns:
+            int: box length of the archive
+        """
+        with open(file_path, "rb") as file:
+            header = file.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size:
+            raise ValueError(f"{file_path} is not a rectangle archive")
+        magic, version, box_length = _FILE_HEADER.unpack(header)
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f"{file_path} is not a rectangle archive")
+        if version != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version {version} in {file_path}")
+        return box_length
+
+    def scan(self):
+        """Reads the headers of all records, that have not been scanned yet, and stores their offsets."""
+        if self.offsets:
+            metadata_offset, metadata_length, columns_offset, num_rectangles, _ = self.offsets[-1]
+            position = columns_offset + len(COLUMNS) * 4 * num_rectangles
+        else:
+            position = _FILE_HEADER.size
+        size = len(self.data)
+        while position + _RECORD_HEADER.size <= size:
+            num_rectangles, num_boxes, metadata_length = _RECORD_HEADER.unpack_from(self.data, position)
+            metadata_offset = position + _RECORD_HEADER.size
+            columns_offset = metadata_offset + metadata_length
+            end = columns_offset + len(COLUMNS) * 4 * num_rectangles
+            if end > size:
+                break
+            self.offsets.append((metadata_offset, metadata_length, columns_offset, num_rectangles, num_boxes))
+            position = end
+
+    def metadata(self, index: int):
+        """Returns the decoded metadata of a record."""
+        metadata_offset, metadata_length, _, _, _ = self.offsets[index]
+        return json.loads(self.data[metadata_offset:metadata_offset + metadata_length].tobytes().decode("utf-8"))
+
+    def columns(self, index: int):
+        """Returns the int32 columns of a record of shape (6, n) as a read-only view into the file."""
+        _, _, columns_offset, num_rectangles, _ = self.offsets[index]
+        end = columns_offset + len(COLUMNS) * 4 * num_rectangles
+        return self.data[columns_offset:end].view("<i4").reshape(len(COLUMNS), num_rectangles)
+
+    def num_boxes(self, index: int):
+        return self.offsets[index][4]
+
+    def rectangles(self, index: int):
+        """Creates the rectangles of a record, e.g. of an instance."""
+        return columns_to_rectangles(self.columns(index), self.metadata(index)["colors"])
+
+    def solution(self, index: int):
+        """Creates the solution of a record."""
+        return columns_to_solution(self.columns(index), self.metadata(index)["colors"], self.box_length, self.num_boxes(index))
+
+    def close(self):
+        # numpy unmaps the file, once the last view is released
+        self.data = None
+
+# =================================================
+#                 Files and conversion
+# =================================================
+
+def write_instance_file(file_path: str, rectangles, box_length: int, metadata: dict = None):
+    """Writes a single instance (e.g. from the rectangle packer viewer) as an archive."""
+    with ArchiveWriter(file_path, box_length) as writer:
+        writer.write_instance(rectangles, metadata)
+
+
+def read_instance_file(file_path: str):
+    """
+    Reads the first instance of an archive.
+
+    Returns:
+        tuple: (list[Rectangle], box length, metadata)
+    """
+    reader = ArchiveReader(file_path)
+    for index in range(len(reader)):
+        metadata = reader.metadata(index)
+        if metadata.get("kind") == "instance":
+            return reader.rectangles(index), reader.box_length, metadata
+    raise ValueError(f"{file_path} contains no instance")
+
+
+def convert_json(json_path: str, archive_path: str = None):
+    """
+    Converts an exported instance (with "rectangles") or a solution file of the test environment (with "solutions")
+    from JSON into an archive.
+
+    Args:
+        json_path (str): path of the JSON file
+        archive_path (str, optional): path of the archive. Defaults to the JSON path with the extension .rpk.
+
+    Returns:
+        str: path of the written archive
+    """
+    if archive_path is None:
+        archive_path = os.path.splitext(json_path)[0] + ARCHIVE_EXTENSION
+    with open(json_path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+
+    with ArchiveWriter(archive_path, int(data.get("box_length", 0))) as writer:
+        if "rectangles" in data:
+            rectangles = [Rectangle(*rect) for rect in data["rectangles"]]
+            metadata = {key: value for key, value in data.items() if key not in ("rectangles", "box_length")}
+            writer.write_instance(rectangles, metadata)
+
+        for solution in data.get("solutions", []):
+            boxes = solution.get("boxes", [])
+            # older solution files have no colors
+            rectangles = [Rectangle(rect["x"], rect["y"], rect["w"], rect["h"], rect.get("color", "white")) for box in boxes for rect in box]
+            box_ids = [box_id for box_id, box in enumerate(boxes) for _ in box]
+            columns, colors = rectangles_to_columns(rectangles, box_ids)
+            metadata = {key: value for key, value in solution.items() if key not in ("boxes", "interim_solutions")}
+            writer.write_record(columns, len(boxes), {**metadata, "kind": "solution", "colors": colors})
+    return archive_path
+
+
+def archive_to_json(archive_path: str, json_path: str):
+    """
+    Writes the solutions of an archive as solution file for the JSON loader of the solution viewer.
+    The solutions are written one after another, so only one of them is held in memory.
+
+    Args:
+        archive_path (str): path of the archive
+        json_path (str): path of the JSON file
+    """
+    reader = ArchiveReader(archive_path)
+    with open(json_path, "w", encoding="utf-8") as file:
+        file.write(f'{{"box_length": {reader.box_length}, "solutions": [')
+        separator = "\n"
+        for index in range(len(reader)):
+            metadata = reader.metadata(index)
+            if metadata.pop("kind", None) != "solution":
+                continue
+            colors = metadata.pop("colors")
+            xs, ys, widths, heights, color_ids, box_ids = reader.columns(index).tolist()
+            boxes = [[] for _ in range(reader.num_boxes(index))]
+            for x, y, w, h, c, box_id in zip(xs, ys, widths, heights, color_ids, box_ids):
+                boxes[box_id].append({"x": x, "y": y, "w": w, "h": h, "color": colors[c]})
+            file.write(separator + json.dumps({**metadata, "boxes": boxes, "interim_solutions": []}, ensure_ascii=False))
+            separator = ",\n"
+        file.write("\n]}\n")
+    reader.close()
+
+
+if __name__ == "__main__":
+    # python -m rectangle_packer_classes.archive file.json [...]
+    for path in sys.argv[1:]:
+        print(f"{path} -> {convert_json(path)}")
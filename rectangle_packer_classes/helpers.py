@@ -1,13 +1,21 @@
+import atexit
+import copy
+import functools
+import itertools
+import multiprocessing
+import os
 import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 
 import numpy as np
 from numba import njit
 
 from base_classes.types import OptimizationProblem
-from rectangle_packer_classes.problem_classes import Rectangle
-from rectangle_packer_classes.utils import color_to_int, copy_numpy_array, int_to_color
-from .neighborhoods import GeometryBasedStrategy, RuleBasedStrategy, OverlapStrategy
+from rectangle_packer_classes.problem_classes import Rectangle, PlacementPolicy
+from rectangle_packer_classes.utils import color_to_int, copy_numpy_array, int_to_color, greedy_pack_numba
+from .neighborhoods import GeometryBasedStrategy, RuleBasedStrategy, OverlapStrategy, AdaptiveNeighborhood, BoxEliminationStrategy
 from enum import Enum
 
 #===================================
@@ -38,6 +46,9 @@ class Neighborhoods(Enum):
     GEOMETRY = "Geometriebasiert"
     RULE = "Regelbasiert"
     OVERLAP = "Überlappungen teilweise zulassen"
+    ADAPTIVE = "Adaptiv (alle Nachbarschaften)"
+    ADAPTIVE_VND = "VND (alle Nachbarschaften nacheinander)"
+    BOX_ELIMINATION = "Boxen auflösen"
 
 def quick_copy(solution):
     """
@@ -88,9 +99,241 @@ def quick_copy_item(item):
     # Create and return a new Rectangle object
     return Rectangle(x, y, w, h, int_to_color(c))
 
-def merge_geometry_based_solutions(problem, neighborhood_name, items, container_size, rulebased_strategy, greedy_algorithm_runner):
+def greedy_pack_arrays(widths, heights, container_size):
     """
-    Merges solutions into one solution, providing a good starting solution for most local searches
+    Fast path of the greedy algorithm: runs the ordered first-fit placement completely inside one numba function.
+    The rectangles have to be passed in placement order already.
+
+    Args:
+        widths, heights (np.ndarray): dimensions of the rectangles
+        container_size (int): size of the container
+
+    Returns:
+        tuple: (x, y, box_id, rotated) arrays with the placement of every rectangle
+    """
+    widths = np.ascontiguousarray(widths, dtype=np.int32)
+    heights = np.ascontiguousarray(heights, dtype=np.int32)
+    return greedy_pack_numba(container_size, widths, heights)
+
+def placements_to_solution(items, container_size, x, y, box_ids, rotated):
+    """
+    Wraps placement arrays of greedy_pack_arrays into a solution object. The given rectangles are placed (and rotated) in place, 
+    like RectanglePacker.add_to_solution would do it.
+
+    Args:
+        items (list[Rectangle]): rectangles in the order of the placement arrays
+        container_size (int): size of the container
+        x, y, box_ids, rotated (np.ndarray): placement arrays
+
+    Returns:
+        RecPac_Solution: solution with all rectangles in their boxes
+    """
+    from rectangle_packer_classes.problem_classes import Box, RecPac_Solution
+    
+    boxes = [Box(container_size) for _ in range(int(box_ids.max()) + 1 if len(box_ids) > 0 else 0)]
+    for item, item_x, item_y, box_id, is_rotated in zip(items, x.tolist(), y.tolist(), box_ids.tolist(), rotated.tolist()):
+        item.x, item.y = item_x, item_y
+        if is_rotated:
+            item.width, item.height = item.height, item.width
+        boxes[box_id].add_item(item)
+    
+    solution = RecPac_Solution()
+    for box in boxes:
+        solution.add_box(box)
+    return solution
+
+def fast_greedy(items, container_size, strategy_name):
+    """
+    Greedy start solution generator on top of the compiled fast path. 
+    The result is the same as the one of the Greedy algorithm with first-fit placement, including the compaction of its final solution.
+
+    Args:
+        items (list[Rectangle]): list of rectangles
+        container_size (int): size of the container
+        strategy_name (str): Greedy strategy name
+
+    Returns:
+        RecPac_Solution: greedy solution
+    """
+    widths, heights = item_dimensions(items)
+    order = compute_sort_order(widths, heights, strategy_name)
+    if order is not None:
+        items = [items[i] for i in order]
+        widths, heights = widths[order], heights[order]
+    x, y, box_ids, rotated = greedy_pack_arrays(widths, heights, container_size)
+    solution = placements_to_solution(items, container_size, x, y, box_ids, rotated)
+    for box in solution.boxes:
+        box.compact()
+    return solution
+
+def solve_sub_instance(items, container_size, strategy_name, placement_policy: PlacementPolicy = PlacementPolicy.FIRST_FIT):
+    """
+    Solves a sub instance with the greedy algorithm. Module level function, so it can be sent to worker processes.
+
+    Args:
+        items (list[Rectangle]): rectangles of the sub instance
+        container_size (int): size of the container
+        strategy_name (str): Greedy strategy name
+        placement_policy (PlacementPolicy, optional): box selection of the greedy algorithm. Defaults to first fit.
+
+    Returns:
+        RecPac_Solution: greedy solution of the sub instance
+    """
+    from base_classes.algorithms import Greedy
+    from rectangle_packer_classes.problem_classes import RecPac_Solution, RectanglePacker
+    
+    if placement_policy == PlacementPolicy.FIRST_FIT:
+        return fast_greedy(items, container_size, strategy_name)
+    problem = RectanglePacker(items, container_size, placement_policy)
+    solution, _ = Greedy(problem, RecPac_Solution, apply_greedy_strategy, strategy_name, True).solve()
+    return solution
+
+# process pools for sub instances by number of workers, they are reused, so the numba kernels are only compiled once per worker
+_sub_instance_pools = {}
+_sub_instance_pools_lock = threading.Lock()
+
+def get_sub_instance_pool(max_workers: int):
+    """
+    Returns the persistent process pool with the given number of workers for sub instances.
+    The workers are spawned instead of forked, since forking a process with running threads (e.g. the worker thread of the UI) can deadlock.
+
+    Args:
+        max_workers (int): number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: pool, that lives until the end of the program (see shutdown_sub_instance_pools)
+    """
+    with _sub_instance_pools_lock:
+        pool = _sub_instance_pools.get(max_workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _sub_instance_pools[max_workers] = pool
+        return pool
+
+@atexit.register
+def shutdown_sub_instance_pools():
+    """
+    Shuts down the persistent process pools for sub instances, registered to run at the exit of the program.
+    """
+    with _sub_instance_pools_lock:
+        pools = list(_sub_instance_pools.values())
+        _sub_instance_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def solve_sub_instances(sub_lists, container_size, sub_solver, max_workers: int = None):
+    """
+    Solves independent sub instances, concurrently on a persistent process pool if more than one worker is used.
+
+    Args:
+        sub_lists (list[list[Rectangle]]): rectangles of the sub instances
+        container_size (int): size of the container
+        sub_solver (function): module level function (items, container_size) -> solution, e.g. a partial of solve_sub_instance
+        max_workers (int, optional): number of worker processes. Defaults to the number of cpu cores.
+
+    Returns:
+        list[RecPac_Solution]: solutions in the order of the sub instances
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(sub_lists))
+    
+    if max_workers <= 1:
+        return [sub_solver(sub_list, container_size) for sub_list in sub_lists]
+    executor = get_sub_instance_pool(max_workers)
+    return list(executor.map(sub_solver, sub_lists, itertools.repeat(container_size)))
+
+def cluster_items_by_size(items, cluster_size: int):
+    """
+    Splits the rectangles into clusters of at most cluster_size rectangles, stratified by size class:
+    every cluster takes every n-th rectangle of the area order, so each one has the same mix of large and small rectangles.
+    Clusters of a single size band would leave the boxes of the large rectangles without small ones to fill their gaps.
+
+    Args:
+        items (list[Rectangle]): list of rectangles
+        cluster_size (int): maximum number of rectangles per cluster
+
+    Returns:
+        list[list[Rectangle]]: clusters, each sorted by area (largest first)
+    """
+    order = compute_sort_order(*item_dimensions(items), GreedyStrategy.LARGEST_AREA_FIRST.value)
+    sorted_items = [items[i] for i in order]
+    num_clusters = max(1, -(-len(sorted_items) // cluster_size))
+    return [sorted_items[k::num_clusters] for k in range(num_clusters)]
+
+def solve_by_decomposition(items, container_size, sub_solver=None, cluster_size: int = 5000, max_workers: int = None, repair_boxes: int = None):
+    """
+    Solves very large instances by splitting them into independent sub problems with the same size class distribution.
+    The sub problems are solved in parallel, merged, and the rectangles of the least filled boxes are placed again in a global repair phase.
+
+    Args:
+        items (list[Rectangle]): list of rectangles
+        container_size (int): size of the container
+        sub_solver (function, optional): module level function (items, container_size) -> solution. Defaults to the greedy algorithm with largest area first.
+        cluster_size (int, optional): maximum number of rectangles per sub problem. Defaults to 5000.
+        max_workers (int, optional): number of worker processes. Defaults to the number of cpu cores.
+        repair_boxes (int, optional): number of least filled boxes for the repair phase. Defaults to two per sub problem.
+
+    Returns:
+        RecPac_Solution: merged and repaired solution
+    """
+    from rectangle_packer_classes.problem_classes import RecPac_Solution, RectanglePacker
+    
+    if sub_solver is None:
+        sub_solver = functools.partial(solve_sub_instance, strategy_name=GreedyStrategy.LARGEST_AREA_FIRST.value)
+    
+    clusters = cluster_items_by_size(items, cluster_size)
+    sub_solutions = solve_sub_instances(clusters, container_size, sub_solver, max_workers)
+    
+    solution = RecPac_Solution()
+    for sub_solution in sub_solutions:
+        for box in sub_solution.boxes:
+            solution.add_box(box)
+    
+    # the free area index keeps the least filled boxes at the end
+    if repair_boxes is None:
+        repair_boxes = 2 * len(clusters)
+    sparse_boxes = solution.free_index.boxes[len(solution.free_index) - min(repair_boxes, len(solution.free_index)):]
+    if len(sparse_boxes) > 1:
+        solution = repair_sparse_boxes(RectanglePacker(items, container_size), solution, sparse_boxes)
+    return solution
+
+def repair_sparse_boxes(problem, solution, sparse_boxes):
+    """
+    Empties the given boxes and places their rectangles (largest first) into the rest of the solution again.
+    The repair works on a copy and is only kept, if it does not need more boxes than before.
+
+    Args:
+        problem (RectanglePacker): optimization problem instance, used for the placement
+        solution (RecPac_Solution): solution that will be repaired
+        sparse_boxes (list[Box]): boxes of the solution, whose rectangles will be placed again
+
+    Returns:
+        RecPac_Solution: repaired solution, or the given solution if the repair did not help
+    """
+    sparse_positions = [solution.boxes.index(box) for box in sparse_boxes]
+    repaired = quick_copy(solution)
+    
+    # detach the sparse boxes of the copy and collect their rectangles
+    detached_boxes = [repaired.boxes[position] for position in sparse_positions]
+    items = []
+    for box in detached_boxes:
+        items.extend(box.items)
+        for item in list(box.items):
+            box.remove_item(item)
+        repaired.check_if_box_empty(box)
+    
+    for item in sorted(items, key=lambda item: item.width * item.height, reverse=True):
+        problem.add_to_solution(repaired, item)
+    
+    if len(repaired.boxes) <= len(solution.boxes):
+        return repaired
+    return solution
+
+def merge_geometry_based_solutions(problem, neighborhood_name, items, container_size, rulebased_strategy, greedy_algorithm_runner, split_factor: int = 4, repair: bool = True, parallel: bool = True):
+    """
+    Merges solutions into one solution, providing a good starting solution for most local searches.
+    The sub instances are independent, so they are solved concurrently on a process pool, if they are split into more than one.
 
     Args:
         problem (OptimizationProblem): optimization problem instance
@@ -98,24 +341,42 @@ def merge_geometry_based_solutions(problem, neighborhood_name, items, container_
         items (list[Rectangle]): list of rectangles
         container_size (int): size of the container
         rulebased_strategy (str): strategy name of the rule-based strategy
-        greedy_algorithm_runner (function): greedy algorithm function for quick starting solutions
+        greedy_algorithm_runner (function): greedy algorithm function for quick starting solutions, used if the sub instances are solved in this process
+        split_factor (int, optional): number of sub instances. Defaults to 4, independent of the cpu cores, so the result does not depend on the machine.
+        repair (bool, optional): places the rectangles of the last (sparse) box of each sub solution again after merging. Defaults to True.
+        parallel (bool, optional): solves the sub instances on a process pool. Defaults to True.
 
     Returns:
         tuple: (start_solution, neighborhood) where start_solution is the merged solution and neighborhood is the corresponding neighborhood strategy
     """
     from rectangle_packer_classes.problem_classes import RecPac_Solution
     
+    cpu_count = os.cpu_count() or 1
+    
     start_solution = RecPac_Solution()
-    sub_lists, neighborhood = get_neighborhood_and_start_solution(problem, neighborhood_name, items, container_size, rulebased_strategy, greedy_algorithm_runner)
+    sub_lists, neighborhood = get_neighborhood_and_start_solution(problem, neighborhood_name, items, container_size, rulebased_strategy, greedy_algorithm_runner, split_factor)
+    sub_lists = [sub_list for sub_list in sub_lists if sub_list]
     
     # apply the greedy algorith to each rectangle sublist and merge all solutions at the end
-    for sub_list in sub_lists:
-        temp_sol, _ = greedy_algorithm_runner(sub_list, container_size, GreedyStrategy.LARGEST_AREA_FIRST.value)
+    max_workers = min(len(sub_lists), cpu_count)
+    if parallel and max_workers > 1:
+        sub_solver = functools.partial(solve_sub_instance, strategy_name=GreedyStrategy.LARGEST_AREA_FIRST.value, placement_policy=problem.placement_policy)
+        sub_solutions = solve_sub_instances(sub_lists, container_size, sub_solver, max_workers)
+    else:
+        sub_solutions = [greedy_algorithm_runner(sub_list, container_size, GreedyStrategy.LARGEST_AREA_FIRST.value)[0] for sub_list in sub_lists]
+    
+    tail_boxes = []
+    for temp_sol in sub_solutions:
         for box in temp_sol.boxes:
             start_solution.add_box(box)
+        if temp_sol.boxes:
+            tail_boxes.append(temp_sol.boxes[-1])
+    
+    if repair and len(tail_boxes) > 1:
+        start_solution = repair_sparse_boxes(problem, start_solution, tail_boxes)
     return start_solution, neighborhood
 
-def get_neighborhood_and_start_solution(problem: OptimizationProblem, neighborhood_name, items, container_size, rulebased_strategy, greedy_algorithm_runner):
+def get_neighborhood_and_start_solution(problem: OptimizationProblem, neighborhood_name, items, container_size, rulebased_strategy, greedy_algorithm_runner, split_factor: int = 4):
     """Returns the initial solution and the neighborhood strategy for the given problem
 
     Args:
@@ -123,8 +384,10 @@ def get_neighborhood_and_start_solution(problem: OptimizationProblem, neighborho
         neighborhood_name (str): name of neighborhood strategy
         items (list[Rectangle]): list of rectangles
         container_size (int): size of the container
-        rulebased_strategy (str): strategy name of the rule-based strategy
+        rulebased_strategy (str): rule of the rule-based neighborhood, it orders the rectangles of its greedy start solution. 
+            The neighborhood derives the permutation from the solution afterwards. An empty name falls back to largest area first
         greedy_algorithm_runner (function): greedy algorithm function for quick starting solutions
+        split_factor (int, optional): number of sub instances for the geometry-based neighborhood. Defaults to 4.
 
     Returns:
         tuple: (start_solution, neighborhood) for the selected strategy.
@@ -133,18 +396,74 @@ def get_neighborhood_and_start_solution(problem: OptimizationProblem, neighborho
     
     # intial solutions for each neighborhood strategy
     start_solution_map = {
-        "Geometriebasiert": lambda: problem.generate_item_samples(items),
-        "Regelbasiert": lambda: greedy_algorithm_runner(items, container_size, GreedyStrategy.LARGEST_AREA_FIRST.value)[0],
+        "Geometriebasiert": lambda: problem.generate_item_samples(items, split_factor),
+        "Regelbasiert": lambda: greedy_algorithm_runner(items, container_size, rulebased_strategy or GreedyStrategy.LARGEST_AREA_FIRST.value)[0],
         "Überlappungen teilweise zulassen": lambda: problem.generate_initial_solution(items, container_size),
+        "Adaptiv (alle Nachbarschaften)": lambda: greedy_algorithm_runner(items, container_size, GreedyStrategy.LARGEST_AREA_FIRST.value)[0],
+        "VND (alle Nachbarschaften nacheinander)": lambda: greedy_algorithm_runner(items, container_size, GreedyStrategy.LARGEST_AREA_FIRST.value)[0],
+        "Boxen auflösen": lambda: greedy_algorithm_runner(items, container_size, GreedyStrategy.LARGEST_AREA_FIRST.value)[0],
+    }
+    
+    # the operators of the adaptive neighborhood return new solutions, so the geometry-based one works on copies
+    adaptive_operators = lambda: {
+        "Geometriebasiert": GeometryBasedStrategy(problem, RecPac_Solution),
+        "Regelbasiert": RuleBasedStrategy(problem),
+        "Überlappungen teilweise zulassen": OverlapStrategy(problem),
+        "Boxen auflösen": BoxEliminationStrategy(problem),
     }
     
     # neighborhood mapping
     neighborhood_map = {
-        "Geometriebasiert": GeometryBasedStrategy(problem, RecPac_Solution),
-        "Regelbasiert": RuleBasedStrategy(problem, rulebased_strategy),
-        "Überlappungen teilweise zulassen": OverlapStrategy(problem)
+        "Geometriebasiert": lambda: GeometryBasedStrategy(problem, RecPac_Solution, in_place=True),
+        "Regelbasiert": lambda: RuleBasedStrategy(problem),
+        "Überlappungen teilweise zulassen": lambda: OverlapStrategy(problem),
+        "Adaptiv (alle Nachbarschaften)": lambda: AdaptiveNeighborhood(adaptive_operators()),
+        "VND (alle Nachbarschaften nacheinander)": lambda: AdaptiveNeighborhood(adaptive_operators(), vnd=True),
+        "Boxen auflösen": lambda: BoxEliminationStrategy(problem, in_place=True),
     }
-    return start_solution_map[neighborhood_name](), neighborhood_map[neighborhood_name]
+    return start_solution_map[neighborhood_name](), neighborhood_map[neighborhood_name]()
+
+def build_portfolio_members(items, container_size, greedy_algorithm_runner, max_iterations=21, placement_policy: PlacementPolicy = PlacementPolicy.FIRST_FIT):
+    """
+    Builds the members of a portfolio for the rectangle packing problem: Greedy with every greedy strategy and 
+    Local Search with every neighborhood. Each member gets its own copy of the rectangles, so they can run concurrently.
+
+    Args:
+        items (list[Rectangle]): list of rectangles
+        container_size (int): size of the container
+        greedy_algorithm_runner (function): greedy algorithm function for quick starting solutions
+        max_iterations (int, optional): maximum number of iterations for the local search members. Defaults to 21.
+        placement_policy (PlacementPolicy, optional): box selection of all members. Defaults to first fit.
+
+    Returns:
+        dict[str, function]: member name mapped to a factory, that builds the solver of that member
+    """
+    from base_classes.algorithms import Greedy, LocalSearch
+    from rectangle_packer_classes.problem_classes import RecPac_Solution, RectanglePacker
+    
+    def greedy_member(strategy_name):
+        def factory():
+            problem = RectanglePacker(copy.deepcopy(items), container_size, placement_policy)
+            return Greedy(problem, RecPac_Solution, apply_greedy_strategy, strategy_name, True)
+        return factory
+    
+    def local_search_member(neighborhood_name):
+        def factory():
+            member_items = copy.deepcopy(items)
+            problem = RectanglePacker(member_items, container_size, placement_policy)
+            if neighborhood_name == Neighborhoods.GEOMETRY.value:
+                start_solution, neighborhood = merge_geometry_based_solutions(problem, neighborhood_name, member_items, container_size, Rules.HEIGHT_FIRST.value, greedy_algorithm_runner, 4, parallel=False)
+            else:
+                start_solution, neighborhood = get_neighborhood_and_start_solution(problem, neighborhood_name, member_items, container_size, Rules.HEIGHT_FIRST.value, greedy_algorithm_runner)
+            return LocalSearch(problem, start_solution, max_iterations, neighborhood, True)
+        return factory
+    
+    members = {}
+    for strategy in GreedyStrategy:
+        members[f"Greedy: {strategy.value}"] = greedy_member(strategy.value)
+    for neighborhood in Neighborhoods:
+        members[f"Lokale Suche: {neighborhood.value}"] = local_search_member(neighborhood.value)
+    return members
 
 def generate_instances(n, min_width, max_width, min_height, max_height, possible_colors):
     """
@@ -171,6 +490,52 @@ def generate_instances(n, min_width, max_width, min_height, max_height, possible
 
     return instances
 
+def compute_sort_order(widths, heights, order_name):
+    """
+    Computes the permutation of a greedy strategy or a rule on the dimensions of the rectangles.
+    Ties are broken by width and height in the same direction, so identical rectangles end up next to each other
+    and can be placed as one group. The sort is stable, so identical rectangles keep their relative order.
+
+    Args:
+        widths (np.ndarray): widths of the rectangles
+        heights (np.ndarray): heights of the rectangles
+        order_name (str): Greedy strategy or rule name
+
+    Returns:
+        np.ndarray: indices of the rectangles in sorted order, None if the name is unknown
+    """
+    widths = np.asarray(widths, dtype=np.int64)
+    heights = np.asarray(heights, dtype=np.int64)
+
+    if order_name in (GreedyStrategy.LARGEST_AREA_FIRST.value, GreedyStrategy.SMALLEST_AREA_FIRST.value, Rules.AREA_FIRST.value):
+        keys = widths * heights
+    elif order_name in (GreedyStrategy.LARGEST_ASPECT_RATIO_FIRST.value, GreedyStrategy.SMALLEST_ASPECT_RATIO.value):
+        keys = np.maximum(widths / heights, heights / widths)
+    elif order_name == Rules.HEIGHT_FIRST.value:
+        keys = heights
+    elif order_name == Rules.WIDTH_FIRST.value:
+        keys = widths
+    else:
+        return None
+
+    # descending orders sort the negated keys, np.lexsort uses the last key as primary key
+    sign = 1 if order_name in (GreedyStrategy.SMALLEST_AREA_FIRST.value, GreedyStrategy.SMALLEST_ASPECT_RATIO.value) else -1
+    return np.lexsort((sign * heights, sign * widths, sign * keys))
+
+def item_dimensions(items):
+    """
+    Collects the dimensions of the rectangles into arrays.
+
+    Args:
+        items (list[Rectangle]): list of rectangles
+
+    Returns:
+        tuple: (widths, heights) as int32 arrays
+    """
+    widths = np.fromiter((item.width for item in items), dtype=np.int32, count=len(items))
+    heights = np.fromiter((item.height for item in items), dtype=np.int32, count=len(items))
+    return widths, heights
+
 def apply_greedy_strategy(items, strategy_name):
     """
     Applies a greedy strategy to provided items.
@@ -182,16 +547,10 @@ def apply_greedy_strategy(items, strategy_name):
     Returns:
         list[Rectangle]: Sorted list of rectangles.
     """
-    if strategy_name == GreedyStrategy.LARGEST_AREA_FIRST.value:
-        items = sorted(items, key=lambda i: i.width * i.height, reverse=True)
-    elif strategy_name == GreedyStrategy.SMALLEST_AREA_FIRST.value:
-        items = sorted(items, key=lambda i: i.width * i.height)
-    elif strategy_name == GreedyStrategy.LARGEST_ASPECT_RATIO_FIRST.value:
-        items = sorted(items, key=lambda i: max(i.width / i.height, i.height / i.width), reverse=True)
-    elif strategy_name == GreedyStrategy.SMALLEST_ASPECT_RATIO.value:
-        items = sorted(items, key=lambda i: max(i.width / i.height, i.height / i.width))
-        
-    return items
+    order = compute_sort_order(*item_dimensions(items), strategy_name)
+    if order is None:
+        return items
+    return [items[i] for i in order]
 
 def apply_rule(items, rule_name):
     """
@@ -202,12 +561,10 @@ def apply_rule(items, rule_name):
         rule_name (str): Rule-based strategy name.
     
     Returns:
-        list[Rectangle]: Reordered list of rectangles.
+        list[Rectangle]: Reordered list of rectangles, None if the rule is unknown.
     """
-    if rule_name == Rules.HEIGHT_FIRST.value:
-        return sorted(items, key=lambda item: item.height, reverse=True)
-    elif rule_name == Rules.AREA_FIRST.value:
-        return sorted(items, key=lambda item: item.height*item.width, reverse=True)
-    elif rule_name == Rules.WIDTH_FIRST.value:
-        return sorted(items, key=lambda item: item.width, reverse=True)
+    order = compute_sort_order(*item_dimensions(items), rule_name)
+    if order is None:
+        return None
+    return [items[i] for i in order]
 
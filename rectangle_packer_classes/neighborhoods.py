@@ -1,25 +1,137 @@
 import random
+import threading
+import time
+import weakref
 import numpy as np
 
 from base_classes.types import  OptimizationProblem, Solution, Neighborhood
 import rectangle_packer_classes.helpers
-from rectangle_packer_classes.problem_classes import RecPac_Solution, Box
+from rectangle_packer_classes.problem_classes import RecPac_Solution, Box, Rectangle, PlacementPolicy
+from rectangle_packer_classes.utils import decode_permutation_numba
 import rectangle_packer_classes
 
-class GeometryBasedStrategy(Neighborhood):
+class UndoLog:
+    """
+    Log of the changes of an in-place neighbor, that can be undone in reverse order.
+    Every change goes through Box.add_item/remove_item, so the free area index and occupancy of the boxes are restored as well.
+    """
+    def __init__(self):
+        self.changes = []
+
+    def record_move(self, item: Rectangle, box_from: Box):
+        """Records the position, size and box of a rectangle before it is moved."""
+        self.changes.append(("move", item, box_from, item.x, item.y, item.width, item.height))
+
+    def record_placement(self, item: Rectangle, box_to: Box):
+        """Records the box, that a moved rectangle was placed in."""
+        self.changes.append(("place", item, box_to))
+
+    def record_box_removal(self, index: int, box: Box):
+        """Records a box, that was removed from the solution at the given position."""
+        self.changes.append(("remove_box", index, box))
+
+    def record_compaction(self, box: Box, old_positions: list):
+        """Records the old positions of the rectangles, that were moved by Box.compact."""
+        self.changes.append(("compact", box, old_positions))
+
+    def undo(self, solution: RecPac_Solution):
+        """
+        Undoes all recorded changes of the solution.
+
+        Args:
+            solution (RecPac_Solution): solution that was changed in place
+        """
+        for change in reversed(self.changes):
+            if change[0] == "place":
+                _, item, box_to = change
+                box_to.remove_item(item)
+            elif change[0] == "move":
+                _, item, box_from, x, y, width, height = change
+                item.x, item.y, item.width, item.height = x, y, width, height
+                box_from.add_item(item)
+            elif change[0] == "compact":
+                _, box, old_positions = change
+                box.set_positions(old_positions)
+            else:
+                _, index, box = change
+                solution.restore_box(index, box)
+        self.changes = []
+
+
+class UndoableNeighborhood(Neighborhood):
+    """
+    Base class of the neighborhoods, that move rectangles of the given solution in place and keep the last undo log per solution.
+
+    Attributes:
+        undo_logs (WeakKeyDictionary): last undo log per solution
+    """
+    def __init__(self):
+        self.undo_logs = weakref.WeakKeyDictionary()
+
+    def revert(self, solution: Solution):
+        """Undoes the last in-place neighbor of the solution.
+
+        Args:
+            solution (Solution): solution that was changed by generate_neighbor
+        """
+        undo_log = self.undo_logs.pop(solution, None)
+        if undo_log is not None:
+            undo_log.undo(solution)
+
+    def commit(self, solution: Solution):
+        """Keeps the last in-place neighbor of the solution and drops its undo log.
+
+        Args:
+            solution (Solution): solution that was changed by generate_neighbor
+        """
+        self.undo_logs.pop(solution, None)
+
+    def has_changes(self, solution: Solution):
+        """Checks if the last in-place neighbor of the solution recorded any change. Failed moves leave no undo log.
+        Copies are always treated as changed.
+
+        Args:
+            solution (Solution): solution that was changed by generate_neighbor
+        """
+        if not self.in_place:
+            return True
+        undo_log = self.undo_logs.get(solution)
+        return undo_log is not None and bool(undo_log.changes)
+
+    def remove_empty_box(self, solution: Solution, box: Box, undo_log: UndoLog = None):
+        """Removes the box from the solution, if it is empty, and records its position for the undo log.
+
+        Args:
+            solution (Solution): solution containing the box
+            box (Box): box that is checked
+            undo_log (UndoLog, optional): undo log of an in-place neighbor
+        """
+        if undo_log is not None and not box.items and box in solution.boxes:
+            undo_log.record_box_removal(solution.boxes.index(box), box)
+        solution.check_if_box_empty(box)
+
+
+class GeometryBasedStrategy(UndoableNeighborhood):
     """
     Geometry-based neighborhood strategy for generating neighboring solutions in the rectangle packing problem by moving rectangles inside and between boxes.
 
     Attributes:
         problem (OptimizationProblem): optimization problem instance
         solution_type (type): Type of the solution used in the problem
+        in_place (bool): moves the rectangles of the given solution and keeps an undo log, instead of working on a copy
     """
-    def __init__(self, problem: OptimizationProblem, solution_type: type):
+    # the moved box only depends on the solution and the failed attempts
+    deterministic = True
+
+    def __init__(self, problem: OptimizationProblem, solution_type: type, in_place: bool = False):
+        super().__init__()
         self.problem = problem
         self.solution_type = solution_type
+        self.in_place = in_place
+        self.failed_attempts = 0 # attempts since a box was emptied the last time
 
     def generate_neighbor(self, solution: Solution, interim_solutions: list, runs_in_test_env: bool = False):
-        """Generates a neighboring solution by moving rectangles inside a box or from one box to another.
+        """Generates a neighboring solution by moving the rectangles of the least filled box into the other boxes (or inside the box).
 
         Args:
             solution (Solution): current solution for which a neighbor will be generated
@@ -33,19 +145,35 @@ class GeometryBasedStrategy(Neighborhood):
         if not solution.boxes:
             return solution
         
-        # deep copy the solution to create a neighbor
-        new_solution = rectangle_packer_classes.helpers.quick_copy(solution)
-
-        # choose last box to attempt moving an item from there
-        box_from = new_solution.boxes[-1]
+        # deep copy the solution to create a neighbor, or change it in place and record the changes
+        if self.in_place:
+            new_solution = solution
+            undo_log = UndoLog()
+            self.undo_logs[solution] = undo_log
+        else:
+            with self.problem.stats.phase("copy"):
+                new_solution = rectangle_packer_classes.helpers.quick_copy(solution)
+            self.problem.stats.count("copies")
+            undo_log = None
+
+        # choose the least filled box to attempt moving an item from there, the free area index keeps it at the end.
+        # after every failed attempt to empty a box, the next fuller box is chosen, until a box could be emptied again
+        free_index = new_solution.free_index
+        box_from = free_index.boxes[len(free_index) - 1 - self.failed_attempts % len(free_index)]
+        num_boxes = len(new_solution.boxes)
         if not box_from.items:
-            new_solution.check_if_box_empty(box_from)
+            self.remove_empty_box(new_solution, box_from, undo_log)
+            self.failed_attempts = 0
             return new_solution
 
-        # attempt to move each item from chosen box
-        for _ in range(len(box_from.items)):
-            rect_to_move = random.choice(box_from.items)
-            box_from.remove_item(rect_to_move)
+        # attempt to move each item from chosen box, largest first. the items are sorted ascending and taken from the back,
+        # items that are placed in the same box again are appended behind the ones that are still to be moved
+        box_from.items.sort(key=lambda item: item.width * item.height)
+        for position in range(len(box_from.items) - 1, -1, -1):
+            rect_to_move = box_from.items[position]
+            if undo_log is not None:
+                undo_log.record_move(rect_to_move, box_from)
+            box_from.remove_item_at(position)
 
             index = 0
 
@@ -66,26 +194,241 @@ class GeometryBasedStrategy(Neighborhood):
                     if rotated:
                         rect_to_move.width, rect_to_move.height = rect_to_move.height, rect_to_move.width
                     box_to.add_item(rect_to_move)
-                    new_solution.check_if_box_empty(box_from)
+                    self.problem.stats.count("rectangles_moved")
+                    if undo_log is not None:
+                        undo_log.record_placement(rect_to_move, box_to)
+                    self.remove_empty_box(new_solution, box_from, undo_log)
                     break
                 
                 else:
                     # move to the next box if no valid position is found
                     index += 1
 
+        # close the holes, that the moved rectangles left in the box
+        if box_from.items:
+            with self.problem.stats.phase("compaction"):
+                old_positions = box_from.compact()
+            if undo_log is not None and old_positions:
+                undo_log.record_compaction(box_from, old_positions)
+
+        if len(new_solution.boxes) < num_boxes:
+            self.problem.stats.count("boxes_emptied")
+        self.failed_attempts = 0 if len(new_solution.boxes) < num_boxes else self.failed_attempts + 1
         return new_solution
 
 
+class BoxEliminationStrategy(UndoableNeighborhood):
+    """
+    Neighborhood strategy, that tries to remove one box by redistributing all of its rectangles into the other boxes.
+    A candidate box is checked by its area and the sizes, that are known not to fit in the other boxes, before any rectangle is moved.
+    The redistribution is aborted and undone at the first rectangle without a position. After a failed candidate the next fuller box is tried,
+    until a box could be eliminated again.
+
+    Attributes:
+        problem (OptimizationProblem): optimization problem instance
+        in_place (bool): changes the given solution and keeps an undo log. Otherwise the rectangles of a copy are redistributed, once the pre-check passed
+        failed_attempts (int): candidates, that could not be eliminated since the last elimination
+    """
+    # the candidate box only depends on the solution and the failed attempts
+    deterministic = True
+
+    def __init__(self, problem: OptimizationProblem, in_place: bool = False):
+        super().__init__()
+        self.problem = problem
+        self.in_place = in_place
+        self.failed_attempts = 0
+
+    def generate_neighbor(self, solution: Solution, interim_solutions: list, runs_in_test_env: bool = False):
+        """Generates a neighboring solution with one box less, or returns the unchanged solution if the candidate box can not be eliminated.
+
+        Args:
+            solution (Solution): current solution for which a neighbor will be generated
+            interim_solutions (list[Solution]): a list of interim solutions, that will be visualized in the UI
+            runs_in_test_env (bool): boolean flag that indicates if this is ran in test environment or not
+
+        Returns:
+            Solution: solution without the candidate box, or the unchanged solution
+        """
+        if len(solution.boxes) < 2:
+            return solution
+
+        # the least filled box is tried first, the free area index keeps it at the end
+        free_index = solution.free_index
+        box_from = free_index.boxes[len(free_index) - 1 - self.failed_attempts % len(free_index)]
+        self.problem.stats.count("elimination_attempts")
+
+        if not self.may_be_eliminated(solution, box_from):
+            self.problem.stats.count("elimination_prechecks_failed")
+            self.failed_attempts += 1
+            return solution
+
+        # in place the given solution is changed, otherwise the redistribution runs on a copy,
+        # so the given solution is never changed and may be shared with other threads
+        if self.in_place:
+            new_solution = solution
+        else:
+            with self.problem.stats.phase("copy"):
+                new_solution = rectangle_packer_classes.helpers.quick_copy(solution)
+            self.problem.stats.count("copies")
+            box_from = new_solution.boxes[solution.boxes.index(box_from)]
+
+        undo_log = UndoLog()
+        if not self.redistribute(new_solution, box_from, undo_log):
+            # a failed elimination leaves no undo log, so the algorithm sees the unchanged solution
+            if self.in_place:
+                undo_log.undo(solution)
+                self.undo_logs.pop(solution, None)
+            self.failed_attempts += 1
+            return solution
+
+        self.failed_attempts = 0
+        self.problem.stats.count("boxes_eliminated")
+        if self.in_place:
+            self.undo_logs[solution] = undo_log
+        return new_solution
+
+    def may_be_eliminated(self, solution: Solution, box: Box):
+        """Fast check, whether the rectangles of the box can fit into the other boxes at all.
+
+        Args:
+            solution (Solution): current solution
+            box (Box): candidate box
+
+        Returns:
+            bool: False if the free area of the other boxes is too small or a rectangle is known not to fit in any of them
+        """
+        other_boxes = [other for other in solution.boxes if other is not box]
+        used_area = box.box_length**2 - box.free_area
+        if used_area > sum(other.free_area for other in other_boxes):
+            return False
+
+        max_free_area = max(other.free_area for other in other_boxes)
+        for item in box.items:
+            item_area = item.width * item.height
+            if item_area > max_free_area:
+                return False
+            if all((item.width, item.height) in other.no_fit for other in other_boxes if other.free_area >= item_area):
+                return False
+        return True
+
+    def redistribute(self, solution: Solution, box_from: Box, undo_log: UndoLog):
+        """Moves all rectangles of the box into the other boxes (largest rectangle first, tightest box first) and removes it.
+
+        Args:
+            solution (Solution): current solution, it is changed in place
+            box_from (Box): box, that will be emptied
+            undo_log (UndoLog): log of all changes
+
+        Returns:
+            bool: True if the box was eliminated, False at the first rectangle without a position
+        """
+        for rect_to_move in sorted(box_from.items, key=lambda item: item.width * item.height, reverse=True):
+            undo_log.record_move(rect_to_move, box_from)
+            box_from.remove_item(rect_to_move)
+
+            placed = False
+            for box_to in solution.free_index.fitting_boxes(rect_to_move.width * rect_to_move.height):
+                if box_to is box_from or (rect_to_move.width, rect_to_move.height) in box_to.no_fit:
+                    continue
+                x, y, rotated = self.problem.find_valid_assignment(box_to, rect_to_move)
+                if x is None:
+                    box_to.no_fit.add((rect_to_move.width, rect_to_move.height))
+                    box_to.no_fit.add((rect_to_move.height, rect_to_move.width))
+                    continue
+
+                rect_to_move.x, rect_to_move.y = x, y
+                if rotated:
+                    rect_to_move.width, rect_to_move.height = rect_to_move.height, rect_to_move.width
+                box_to.add_item(rect_to_move)
+                undo_log.record_placement(rect_to_move, box_to)
+                placed = True
+                break
+
+            if not placed:
+                return False
+
+        self.remove_empty_box(solution, box_from, undo_log)
+        return True
+
+
+class PermutationState:
+    """
+    Array representation of a solution of the rule-based neighborhood.
+    The dimensions and colors of the rectangles never change, a neighbor only swaps entries of the permutation 
+    and writes the placements of the decoded positions into the coordinate arrays.
+
+    Attributes:
+        widths, heights (np.array): int32 dimensions of the rectangles, shared by all derived states
+        colors (list[str]): colors of the rectangles, shared by all derived states
+        order (np.array): rectangle index at every position of the permutation
+        rotated (np.array): orientation of the rectangle at every position
+        xs, ys, box_ids (np.array): placement of every position
+    """
+    def __init__(self, widths, heights, colors, order, rotated, xs, ys, box_ids):
+        self.widths = widths
+        self.heights = heights
+        self.colors = colors
+        self.order = order
+        self.rotated = rotated
+        self.xs = xs
+        self.ys = ys
+        self.box_ids = box_ids
+
+    @classmethod
+    def from_solution(cls, solution: Solution):
+        """Builds the state of a solution, the permutation lists the items box by box in placement order."""
+        items = [item for box in solution.boxes for item in box.items]
+        box_ids = [index for index, box in enumerate(solution.boxes) for _ in box.items]
+        return cls(
+            np.array([item.width for item in items], dtype=np.int32),
+            np.array([item.height for item in items], dtype=np.int32),
+            [item.color for item in items],
+            np.arange(len(items), dtype=np.int32),
+            np.zeros(len(items), dtype=np.bool_),
+            np.array([item.x for item in items], dtype=np.int32),
+            np.array([item.y for item in items], dtype=np.int32),
+            np.array(box_ids, dtype=np.int32),
+        )
+
+    def copy(self):
+        """Copies the permutation and placements, the dimensions and colors are shared."""
+        return PermutationState(self.widths, self.heights, self.colors, self.order.copy(), self.rotated.copy(), 
+                                self.xs.copy(), self.ys.copy(), self.box_ids.copy())
+
+    def group_by_box(self):
+        """Reorders the positions box by box, keeping the placement order inside every box."""
+        grouping = np.argsort(self.box_ids, kind="stable")
+        self.order = self.order[grouping]
+        self.rotated = self.rotated[grouping]
+        self.xs = self.xs[grouping]
+        self.ys = self.ys[grouping]
+        self.box_ids = self.box_ids[grouping]
+
+    def to_solution(self, box_length: int, num_boxes: int):
+        """Materializes the placements as a solution with new boxes and rectangles."""
+        boxes = [Box(box_length) for _ in range(num_boxes)]
+        widths, heights = self.widths.tolist(), self.heights.tolist()
+        for index, rotated, x, y, box_id in zip(self.order.tolist(), self.rotated.tolist(), self.xs.tolist(), self.ys.tolist(), self.box_ids.tolist()):
+            width, height = (heights[index], widths[index]) if rotated else (widths[index], heights[index])
+            boxes[box_id].add_item(Rectangle(x, y, width, height, self.colors[index]))
+
+        solution = RecPac_Solution()
+        for box in boxes:
+            solution.add_box(box)
+        return solution
+
 class RuleBasedStrategy(Neighborhood):
     """Rule-based neighborhood strategy for generating neighboring solutions in teh rectangle packing problem by rearranging rectangles according to a rule.
+    The neighbors are decoded from an integer permutation over the item dimensions, the rectangle objects are only created for the result.
 
     Attributes:
         problem (OptimizationProblem): the optimization problem instance
-        rule (str): rule name used to reorder rectangles
+        states (WeakKeyDictionary): permutation state and version of every known solution, guarded by lock
     """
-    def __init__(self, problem: OptimizationProblem, rule: str):
-        problem.items = rectangle_packer_classes.helpers.apply_rule(problem.items, rule)
+    def __init__(self, problem: OptimizationProblem):
         self.problem = problem
+        self.states = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
 
     def generate_neighbor(self, solution: Solution, interim_solutions: list, test_environment: bool = False):
         """Generates a neighboring solution by reordering rectangles based on a rule and swapping two adjacent rectangles
@@ -102,44 +445,107 @@ class RuleBasedStrategy(Neighborhood):
         if not solution.boxes:
             return solution
 
-        # create a new solution and collect all items from current boxes
-        current_solution = RecPac_Solution()
-        items = [] # current permutation
-        for box in solution.boxes:
-            items.extend([rectangle_packer_classes.helpers.quick_copy_item(item) for item in box.items])
+        state = self.current_state(solution)
+        return self.swap_neighbor(state, self.random_swap_index(len(state.order)))
 
-        # only rearrange items if there are at least two rectangles
-        if len(items) > 1:
-            # select a random rectangle from the smaller half of the rectangle lsit
-            small_rectangles = items[:len(items) // 2]
-            selected = random.choice(small_rectangles)
+    def generate_neighbors(self, solution: Solution, count: int, interim_solutions: list, test_environment: bool = False, executor=None):
+        """Generates several neighbors of the solution, see Neighborhood.generate_neighbors. 
+        The swap positions are drawn before the neighbors are decoded, so they do not depend on the scheduling of the threads.
 
-            # swap the selected recrtangle with its adjacent item
-            i = items.index(selected)
-            j = i + 1 if i < len(items) - 1 else i - 1 # adjacent index
-            items[i], items[j] = items[j], items[i]
+        Returns:
+            list[tuple[float, RecPac_Solution]]: score and neighbor of every generated neighbor
+        """
+        if count <= 1 or not solution.boxes:
+            return [self.scored_neighbor(solution, interim_solutions, test_environment)]
+
+        state = self.current_state(solution)
+        swap_indices = [self.random_swap_index(len(state.order)) for _ in range(count)]
+
+        def scored_swap_neighbor(swap_index):
+            neighbor = self.swap_neighbor(state, swap_index)
+            return neighbor.evaluate_solution(), neighbor
+
+        if executor is None:
+            return [scored_swap_neighbor(swap_index) for swap_index in swap_indices]
+        return list(executor.map(scored_swap_neighbor, swap_indices))
+
+    def current_state(self, solution: Solution):
+        """Returns the permutation state of the solution, which lists the items box by box. 
+        The state is derived again, if the solution was changed since it was stored.
+
+        Args:
+            solution (Solution): current solution
+
+        Returns:
+            PermutationState: state of the solution, it must not be changed
+        """
+        with self.lock:
+            state, version = self.states.get(solution, (None, None))
+        if state is None or version != solution.version:
+            state = PermutationState.from_solution(solution)
+            with self.lock:
+                self.states[solution] = (state, solution.version)
+        return state
 
-        # reset position and rebuild the solution
-        for item in items:
-            item.x, item.y = None, None # reset position
+    def random_swap_index(self, num_items: int):
+        """Selects a random rectangle from the smaller half of the permutation, that is swapped with its successor.
 
-            # attempt to place the item into the solution
-            new_solution = self.problem.add_to_solution(current_solution, item)
+        Returns:
+            int: position of the rectangle, None if there are less than two rectangles
+        """
+        return random.randrange(num_items // 2) if num_items > 1 else None
 
-            # update the current solution if placement was successful
-            if new_solution is not None:
-                current_solution = new_solution
+    def swap_neighbor(self, state: PermutationState, swap_index: int):
+        """Swaps two adjacent rectangles of the permutation and decodes it again from the swap position.
 
-        return current_solution
+        Args:
+            state (PermutationState): state of the current solution, it is not changed
+            swap_index (int): position of the first swapped rectangle, None to keep the permutation
+
+        Returns:
+            RecPac_Solution: the decoded neighbor
+        """
+        state = state.copy()
+        start = len(state.order)
+        if swap_index is not None:
+            state.order[[swap_index, swap_index + 1]] = state.order[[swap_index + 1, swap_index]]
+            state.rotated[[swap_index, swap_index + 1]] = state.rotated[[swap_index + 1, swap_index]]
+            start = swap_index
+
+        # the boxes hold their items in placement order, so decoding the permutation places every item before the swap 
+        # exactly where it is in the current solution. only the rest is placed again, with the placement policy of the problem
+        best_fit = self.problem.placement_policy == PlacementPolicy.BEST_FIT
+        with self.problem.stats.phase("decode"):
+            num_boxes = decode_permutation_numba(self.problem.container_size, state.widths, state.heights, 
+                                                 state.order, state.rotated, state.xs, state.ys, state.box_ids, start, best_fit)
+            state.group_by_box()
+        self.problem.stats.count("decode_calls")
+        self.problem.stats.count("rectangles_decoded", len(state.order) - start)
+
+        with self.problem.stats.phase("materialize"):
+            new_solution = state.to_solution(self.problem.container_size, num_boxes)
+        with self.lock:
+            self.states[new_solution] = (state, new_solution.version)
+        return new_solution
 
 class OverlapStrategy(Neighborhood):
     """Overlap-based neighborhood strategy for generating neighboring solutions in the rectnalge packing problem by gradually reducing overlap.
+    Every call places all rectangles again (first fit over the boxes) and lets them overlap by 30% of the current overlap percentage.
+    The percentage decays with every call, so the rectangles are packed densely with overlaps first and pushed apart until none overlap anymore.
+    There is no check, which rectangles violate the percentage: the check compared every rectangle with itself as well, 
+    so all of them violated every percentage below 1.0, and the results depend on placing all of them again.
 
     Attributes:
         problem (OptimizationProblem): optimization problem instance
-        initial_overlap (float): starting allowed overlap percentage
-        decay (float): rate at which overlap is reduced per iteartion
+        overlap_percentage (float): current allowed overlap percentage, starts at initial_overlap. the rectangles are only placed again while it is below 1.0
+        decay_rate (float): amount, by which the overlap percentage is reduced per call
     """
+    # the neighbor only depends on the solution and the current overlap percentage, which decays once per call
+    deterministic = True
+    # the rectangles are placed again in the given solution, so the search moves through the states with overlaps
+    # even if they score worse. a copy would only continue from accepted neighbors and end up with more boxes
+    changes_input = True
+
     def __init__(self, problem: OptimizationProblem, initial_overlap: float = 1.0, decay_rate: float = 0.05):
         self.overlap_percentage = initial_overlap
         self.decay_rate = decay_rate
@@ -149,20 +555,23 @@ class OverlapStrategy(Neighborhood):
         """generates a neighboring solution by reducing the overlap of rectangles, based on teh current overlap percentage
 
         Args:
-            solution (Solution): current solution, for which a neighbor will be generated
+            solution (Solution): current solution, for which a neighbor will be generated. it is changed in place
 
         Returns:
-            Solution: a new solution which is a neighbor of previous one
+            Solution: the changed solution
         """
         # Note: deep copying avoided for performance reasons
         new_solution = solution
 
-        # iterate through each box to check and resolve overlaps
+        # the rectangles are placed again, once the allowed overlap is below 100%
+        relocate = self.overlap_percentage < 1.0
+
+        # iterate through each box to resolve overlaps
         for box in new_solution.boxes:
-            spatial_data = self.build_spatial_array(box)
-            items_to_relocate = self.find_violating_rectangles(box, spatial_data)
+            items_to_relocate = list(box.items) if relocate else []
 
-            # remove and reassign overlapping rectangles
+            # remove and reassign the rectangles
+            self.problem.stats.count("rectangles_relocated", len(items_to_relocate))
             for item in items_to_relocate:
                 box.remove_item(item)
             self.reassign_rectangles(new_solution, items_to_relocate)
@@ -179,41 +588,6 @@ class OverlapStrategy(Neighborhood):
             
         return new_solution
 
-    def build_spatial_array(self, box: Box):
-        """builds a spatial array containing coordinates and areas of rectangles in the box
-
-        Args:
-            box (Box): box containing the rectnalges
-
-        Returns:
-            np.array: array of spatial data for all rectangles in the box
-        """
-        if not box.items:
-            return np.empty((0, 5), dtype=np.float32)
-
-        # create array for vectorized overlap calculations
-        return np.array([[rect.x, rect.y, rect.x + rect.width, rect.y + rect.height, rect.width * rect.height] for rect in box.items], dtype=np.float32)
-
-    def find_violating_rectangles(self, box, spatial_data):
-        """identifies rectangles that violate the allowed overlap percentage
-
-        Args:
-            box (Box): box containing the rectangles which will be checked
-            spatial_data (np.array): spatial data for overlap calculations
-
-        Returns:
-            list[rectangles]: list of rectangles that violate the overlap constraints
-        """
-        violating_items = []
-
-        # check each rectangle for overlap violations
-        for rect in box.items:
-            rect_arr = np.array([rect.x, rect.y, rect.x + rect.width, rect.y + rect.height, rect.width * rect.height], dtype=np.float32)
-            if not self.check_overlap_vectorized(spatial_data, rect_arr, self.overlap_percentage):
-                violating_items.append(rect)
-
-        return violating_items
-
     def reassign_rectangles(self, new_solution, items_to_relocate):
         """attempts to reassign rectangles that violated the overlap constraints into existing or new boxes.
 
@@ -242,32 +616,120 @@ class OverlapStrategy(Neighborhood):
                 new_box.add_item(item)
                 new_solution.add_box(new_box)
 
-    def check_overlap_vectorized(self, spatial_data, rect_arr, overlap_percentage):
-        """CHecks if a rectangle exceeds the allowed overlap percentage with others.
 
-        Args:
-            spatial_data (np.array): spatial data for existing rectangles
-            rect_arr (np.array): spatial data for the rectangle being checked
-            overlap_percentage (float): maximum allowed overlap percentage
+class AdaptiveNeighborhood(Neighborhood):
+    """
+    Composite neighborhood, that uses several neighborhoods (operators) in one run.
+    In adaptive mode an operator is drawn for every neighbor by probability matching, weighted by its recent improvement
+    per millisecond. Every operator keeps a minimum probability, so it can recover if it starts to pay off later.
+    In VND mode the operators are chained: an operator is used until it does not improve anymore, then the next one,
+    and after every improvement the search starts with the first operator again.
+    The operators have to return new solutions, in-place operators are not supported. Operators that change their input
+    are given a copy, so the current solution of the algorithm stays unchanged.
 
-        Returns:
-            bool: true if overlap is within the constraint, faklse otherwise
-        """
-        if spatial_data.shape[0] == 0:
-            return True # no other rectangles, no overlap
-        rect_x1, rect_y1, rect_x2, rect_y2, rect_area = rect_arr
+    Attributes:
+        operators (dict[str, Neighborhood]): operators by name, in VND order
+        vnd (bool): chains the operators instead of drawing them
+        decay (float): weight of the previous rewards of an operator, when a new reward is recorded
+        min_probability (float): probability of every operator to be drawn in adaptive mode
+        rewards (dict[str, float]): decayed improvement per millisecond of every operator
+        stats (dict[str, dict]): calls, improvements, gain and time (ms) of every operator
+    """
+    def __init__(self, operators: dict, vnd: bool = False, decay: float = 0.8, min_probability: float = 0.05):
+        if not operators:
+            raise ValueError("at least one operator is needed")
+        for name, operator in operators.items():
+            if operator.in_place:
+                raise ValueError(f"operator {name} changes solutions in place")
+
+        self.operators = operators
+        self.names = list(operators)
+        self.vnd = vnd
+        self.decay = decay
+        self.min_probability = min(min_probability, 1 / len(self.names))
+        self.rewards = {name: 0.0 for name in self.names}
+        self.stats = {name: {"calls": 0, "improvements": 0, "gain": 0.0, "time": 0.0} for name in self.names}
+        self.current = 0 # position of the operator in VND mode
+        self.lock = threading.Lock()
+        self.operator_lock = threading.Lock()
 
-        # claculate overlap using vectorized operations
-        x_overlap = np.maximum(0, np.minimum(spatial_data[:, 2], rect_x2) - np.maximum(spatial_data[:, 0], rect_x1))
-        y_overlap = np.maximum(0, np.minimum(spatial_data[:, 3], rect_y2) - np.maximum(spatial_data[:, 1], rect_y1))
+    def generate_neighbor(self, solution: Solution, interim_solutions: list, test_environment: bool = False):
+        """Generates a neighbor with the selected operator and records its improvement over the given solution.
 
-        overlap_areas = x_overlap * y_overlap
-        max_areas = np.maximum(rect_area, spatial_data[:, 4])
+        Args:
+            solution (Solution): current solution, for which a neighbor will be generated
+            interim_solutions (list[Solution]): a list of interim solutions, that will be visualized in the UI
+            test_environment (bool): skips the interim solutions
 
-        # calculate overlap rations and check against the allowed percentage
-        overlap_ratios = overlap_areas / max_areas
-        if np.any(overlap_ratios > overlap_percentage):
-            return False
+        Returns:
+            Solution: the neighbor generated by the selected operator
+        """
+        with self.lock:
+            name = self.select_operator()
+
+        # the operators keep state between calls (e.g. failed attempts, overlap percentage), so they are called one at a time.
+        # only the evaluation runs concurrently, the scores are cached by the solutions, so the algorithm does not evaluate the neighbor again
+        value = solution.evaluate_solution()
+        operator = self.operators[name]
+        with self.operator_lock:
+            start_time = time.perf_counter()
+            if operator.changes_input:
+                solution = rectangle_packer_classes.helpers.quick_copy(solution)
+            neighbor = operator.generate_neighbor(solution, interim_solutions, test_environment)
+            elapsed_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        gain = float(value - neighbor.evaluate_solution())
+        elapsed_time += time.perf_counter() - start_time
+        self.record(name, gain, elapsed_time * 1000)
+        return neighbor
+
+    def select_operator(self):
+        """Returns the name of the next operator."""
+        if self.vnd:
+            return self.names[self.current]
+
+        total = sum(self.rewards.values())
+        if total <= 0:
+            return random.choice(self.names)
+        scale = 1 - len(self.names) * self.min_probability
+        weights = [self.min_probability + scale * self.rewards[name] / total for name in self.names]
+        return random.choices(self.names, weights=weights)[0]
+
+    def record(self, name: str, gain: float, elapsed_ms: float):
+        """Updates the reward and statistics of an operator after it generated a neighbor.
 
-        return True
+        Args:
+            name (str): name of the operator
+            gain (float): score of the solution minus score of the neighbor (positive if it improved)
+            elapsed_ms (float): time to generate and evaluate the neighbor
+        """
+        with self.lock:
+            stats = self.stats[name]
+            stats["calls"] += 1
+            stats["time"] += elapsed_ms
+            if gain > 0:
+                stats["improvements"] += 1
+                stats["gain"] += gain
+
+            reward = max(gain, 0.0) / max(elapsed_ms, 1e-3)
+            self.rewards[name] = self.decay * self.rewards[name] + (1 - self.decay) * reward
+            if self.vnd:
+                self.current = 0 if gain > 0 else (self.current + 1) % len(self.names)
+
+    def operator_stats(self):
+        """Summarizes the usage and yield of the operators.
 
+        Returns:
+            list[dict]: name, calls, share of all calls, improvements, total gain, gain per millisecond and current reward of every operator
+        """
+        with self.lock:
+            total_calls = sum(stats["calls"] for stats in self.stats.values())
+            return [{
+                "operator": name,
+                "calls": stats["calls"],
+                "share": stats["calls"] / total_calls if total_calls else 0.0,
+                "improvements": stats["improvements"],
+                "gain": stats["gain"],
+                "gain_per_ms": stats["gain"] / stats["time"] if stats["time"] else 0.0,
+                "reward": self.rewards[name],
+            } for name, stats in self.stats.items()]
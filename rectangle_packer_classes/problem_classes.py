@@ -1,8 +1,20 @@
+import bisect
+import itertools
+import math
+from enum import Enum
 from typing import List
 from base_classes.types import Item, Solution, Container, OptimizationProblem
 import numpy as np
 
-from rectangle_packer_classes.utils import compute_overlap_numba, find_valid_assignment_numba
+from rectangle_packer_classes.utils import compute_overlap_numba, find_valid_assignment_numba, build_occupancy_pyramid, mark_occupancy, scan_occupancy_pyramid, compact_numba
+
+class PlacementPolicy(Enum):
+    """
+    Enum for the box selection of RectanglePacker.add_to_solution
+    """
+    FIRST_FIT = "Erste passende Box"
+    BEST_FIT = "Engste passende Box"
+
 
 class Rectangle(Item):
     """
@@ -26,6 +38,11 @@ class Box(Container):
     def __init__(self, box_length: int):
         self.box_length = box_length
         self.items: Rectangle = []
+        self.free_area = box_length**2
+        self.owner = None # solution, whose free area index contains this box
+        self.uid = None
+        self.no_fit = set() # (width, height) of rectangles, that do not fit in any orientation since the last change
+        self.occupancy = None # (coverage_grid, free_8, free_64), built on the first placement search
 
     def __repr__(self):
         return f"Box(box_length={self.box_length}, rectangles={self.items})"
@@ -37,6 +54,9 @@ class Box(Container):
             item (Rectangle): rectangle item, that will be added
         """
         self.items.append(item)
+        self.change_free_area(-item.width * item.height)
+        if self.occupancy is not None:
+            mark_occupancy(*self.occupancy, item.x, item.y, item.width, item.height, 1)
 
     def remove_item(self, item: Rectangle):
         """Remove item from the box
@@ -45,20 +65,170 @@ class Box(Container):
             item (Rectangle): the rectangle item, which will be removed from the box
         """
         self.items.remove(item)
+        self.change_free_area(item.width * item.height)
+        if self.occupancy is not None:
+            mark_occupancy(*self.occupancy, item.x, item.y, item.width, item.height, -1)
+
+    def remove_item_at(self, index: int):
+        """Remove the item at the given position in constant time, by moving the last item to its position.
+
+        Args:
+            index (int): position of the item in the items list
+
+        Returns:
+            Rectangle: the removed item
+        """
+        item = self.items[index]
+        self.items[index] = self.items[-1]
+        self.items.pop()
+        self.change_free_area(item.width * item.height)
+        if self.occupancy is not None:
+            mark_occupancy(*self.occupancy, item.x, item.y, item.width, item.height, -1)
+        return item
+
+    def occupancy_pyramid(self):
+        """Returns the occupancy pyramid of the box (coverage grid and free cells per 8x8 and 64x64 block). 
+        It is built on the first call and kept up to date by add_item and remove_item afterwards.
+
+        Returns:
+            tuple: (coverage_grid, free_8, free_64)
+        """
+        if self.occupancy is None:
+            items_x = np.array([r.x for r in self.items], dtype=np.int32)
+            items_y = np.array([r.y for r in self.items], dtype=np.int32)
+            items_width = np.array([r.width for r in self.items], dtype=np.int32)
+            items_height = np.array([r.height for r in self.items], dtype=np.int32)
+            self.occupancy = build_occupancy_pyramid(self.box_length, items_x, items_y, items_width, items_height)
+        return self.occupancy
+
+    def compact(self):
+        """Slides the rectangles towards the origin (bottom-left), so the free space of the box becomes contiguous.
+        Boxes with overlapping rectangles are left unchanged.
+
+        Returns:
+            list[tuple]: (item, x, y) with the old positions of the moved rectangles, empty if nothing was moved
+        """
+        if not self.items:
+            return []
+        items_x = np.array([r.x for r in self.items], dtype=np.int32)
+        items_y = np.array([r.y for r in self.items], dtype=np.int32)
+        items_width = np.array([r.width for r in self.items], dtype=np.int32)
+        items_height = np.array([r.height for r in self.items], dtype=np.int32)
+        # the rectangles closest to the origin are moved first
+        order = np.argsort(items_x + items_y, kind="stable")
+        if not compact_numba(self.box_length, items_x, items_y, items_width, items_height, order):
+            return []
+
+        old_positions = [(item, item.x, item.y) for item in self.items]
+        self.set_positions(zip(self.items, items_x.tolist(), items_y.tolist()))
+        return [(item, x, y) for (item, x, y), new_x, new_y in zip(old_positions, items_x.tolist(), items_y.tolist()) if (x, y) != (new_x, new_y)]
+
+    def set_positions(self, positions):
+        """Moves rectangles of the box to new positions, e.g. to undo a compaction.
+
+        Args:
+            positions (iterable[tuple]): (item, x, y) for every rectangle, that is moved
+        """
+        for item, x, y in positions:
+            item.x, item.y = x, y
+        # the occupancy is built again on the next search
+        self.release_occupancy()
+        self.no_fit.clear()
+        if self.owner is not None:
+            self.owner.version += 1
+
+    def release_occupancy(self):
+        """Frees the occupancy pyramid of a box, that will not be searched anymore (e.g. a closed box)."""
+        self.occupancy = None
+
+    def change_free_area(self, delta: int):
+        """Updates the free area of the box and its position in the free area index of its solution.
+        Every change of the box invalidates the remembered rectangles, that did not fit.
+
+        Args:
+            delta (int): change of the free area
+        """
+        old_free_area = self.free_area
+        self.free_area += delta
+        self.no_fit.clear()
+        if self.owner is not None:
+            self.owner.free_index.update(self, old_free_area)
+            self.owner.version += 1
+
+
+class BoxIndex:
+    """
+    Priority index, that keeps the boxes of a solution sorted by their free area (ascending).
+    It is updated by the boxes themselves on every add and remove.
+    """
+    def __init__(self):
+        self.keys = [] # sorted (free_area, uid) tuples
+        self.boxes = []
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def add(self, box: Box):
+        key = (box.free_area, box.uid)
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.boxes.insert(index, box)
+
+    def remove(self, box: Box, free_area: int = None):
+        key = (box.free_area if free_area is None else free_area, box.uid)
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+            del self.boxes[index]
+
+    def update(self, box: Box, old_free_area: int):
+        self.remove(box, old_free_area)
+        self.add(box)
+
+    def fitting_boxes(self, min_free_area: int):
+        """Yields all boxes with at least min_free_area free area, the tightest box first.
+
+        Args:
+            min_free_area (int): area that has to be free in the box
+        """
+        for index in range(bisect.bisect_left(self.keys, (min_free_area, -1)), len(self.boxes)):
+            yield self.boxes[index]
 
 
 class RecPac_Solution(Solution):
     """
     Clss that represents a solution of the rectangle packing problem.
     """
+    _box_uids = itertools.count()
+
     def __init__(self):
         self.boxes: List[Box] = []
+        self.free_index = BoxIndex()
+        self.version = 0 # counts the changes of the solution, so derived data can be checked for staleness
+        self.cached_score = None # (version and weights, score) of the last evaluation
 
     def add_box(self, box: Box):
         """
         Adds a box to the solution.
         """
         self.boxes.append(box)
+        box.owner = self
+        box.uid = next(RecPac_Solution._box_uids)
+        self.free_index.add(box)
+        self.version += 1
+
+    def restore_box(self, index: int, box: Box):
+        """
+        Inserts a removed box at its old position again, e.g. when a move is undone.
+
+        Args:
+            index (int): position of the box in the box list
+            box (Box): box that was removed before
+        """
+        self.boxes.insert(index, box)
+        box.owner = self
+        self.free_index.add(box)
+        self.version += 1
 
     def check_if_box_empty(self, box: Box):
         """
@@ -68,7 +238,20 @@ class RecPac_Solution(Solution):
             box (Box): the box which is checked
         """
         if len(box.items) == 0:
-            self.boxes.remove(box)
+            self.remove_box(box)
+
+    def remove_box(self, box: Box):
+        """
+        Removes a box with its rectangles from the solution, e.g. when it is closed by a streaming packer.
+
+        Args:
+            box (Box): box of the solution
+        """
+        self.boxes.remove(box)
+        self.free_index.remove(box)
+        box.owner = None
+        box.release_occupancy()
+        self.version += 1
 
     def evaluate_solution(self, w1=1.0, w2=0.5, w3=0.2, w4=100):
         """Evaluates the solution based on number of boxes, space utilization, unused space and overlapping items.
@@ -82,6 +265,11 @@ class RecPac_Solution(Solution):
         Returns:
             float: evaluation score of the solution. The lower the number the better the solution is
         """
+        # the score is only computed again, if the solution was changed since the last evaluation
+        key = (self.version, w1, w2, w3, w4)
+        if self.cached_score is not None and self.cached_score[0] == key:
+            return self.cached_score[1]
+
         num_boxes = len(self.boxes)
 
         total_area_used, total_box_area, total_overlap_area = 0, 0, 0
@@ -102,7 +290,25 @@ class RecPac_Solution(Solution):
         utilization = total_area_used / total_box_area
         unused_space = total_box_area - total_area_used
 
-        return (w1 * num_boxes) + (w2 * (1 - utilization)) + (w3 * unused_space) + (w4 * total_overlap_area)
+        score = (w1 * num_boxes) + (w2 * (1 - utilization)) + (w3 * unused_space) + (w4 * total_overlap_area)
+        self.cached_score = (key, score)
+        return score
+
+    def is_feasible(self):
+        """Checks that every rectangle lies inside its box and no two rectangles of a box overlap.
+        Neighborhoods, that allow overlaps, can produce solutions with few boxes, that are not valid.
+
+        Returns:
+            bool: True if the solution is valid
+        """
+        for box in self.boxes:
+            for i, rect in enumerate(box.items):
+                if rect.x < 0 or rect.y < 0 or rect.x + rect.width > box.box_length or rect.y + rect.height > box.box_length:
+                    return False
+                for j in range(i+1, len(box.items)):
+                    if self.compute_overlap(rect, box.items[j]) > 0:
+                        return False
+        return True
 
     def compute_overlap(self, rect1, rect2):
         """Calls a numba method, that will compute the overlap between two rectangles.
@@ -153,6 +359,78 @@ class RecPac_Solution(Solution):
     def __repr__(self):
         return f"RecPac_Solution(boxes={self.boxes})"
 
+class ConstructionPass:
+    """
+    Bookkeeping of a constructive pass (Greedy, Backtracking) over a known list of items.
+    It tracks the smallest area of the items, that still have to be placed, and the boxes that can still take one of them.
+    A box whose free area is smaller than the smallest remaining item is closed and never probed again during the pass.
+
+    Attributes:
+        solution (RecPac_Solution): solution that is built by the pass, bound on the first placement
+        pending (set[int]): ids of the items that still have to be placed
+        active_boxes (list[Box]): open boxes in the order of the solution
+    """
+    def __init__(self, items: List[Rectangle]):
+        self.solution = None
+        self.pending = {id(item) for item in items}
+        self.area_counts = {}
+        for item in items:
+            area = item.width * item.height
+            self.area_counts[area] = self.area_counts.get(area, 0) + 1
+        self.areas = sorted(self.area_counts)
+        self.area_pointer = 0
+        self.active_boxes = []
+
+    def min_remaining_area(self):
+        if self.area_pointer >= len(self.areas):
+            return math.inf
+        return self.areas[self.area_pointer]
+
+    def item_placed(self, item: Rectangle, box: Box):
+        """Removes the placed item from the pending items and closes the boxes, that can not take any remaining item.
+
+        Args:
+            item (Rectangle): the placed item
+            box (Box): the box the item was placed in
+        """
+        if id(item) not in self.pending:
+            return
+        self.pending.discard(id(item))
+        
+        area = item.width * item.height
+        self.area_counts[area] -= 1
+        min_area_changed = False
+        while self.area_pointer < len(self.areas) and self.area_counts[self.areas[self.area_pointer]] == 0:
+            self.area_pointer += 1
+            min_area_changed = True
+
+        min_area = self.min_remaining_area()
+        if min_area_changed:
+            # the smallest remaining item got larger, so any box can have been closed by it
+            still_active = []
+            for active_box in self.active_boxes:
+                if active_box.free_area >= min_area:
+                    still_active.append(active_box)
+                else:
+                    active_box.release_occupancy()
+            self.active_boxes = still_active
+        elif box.free_area < min_area and box in self.active_boxes:
+            self.active_boxes.remove(box)
+            box.release_occupancy()
+
+    def box_opened(self, box: Box):
+        if box.free_area >= self.min_remaining_area():
+            self.active_boxes.append(box)
+
+    def is_running_on(self, solution):
+        """Checks if the pass builds the given solution. A pass binds to the first solution it sees and ends when every item is placed."""
+        if not self.pending:
+            return False
+        if self.solution is None and not solution.boxes:
+            self.solution = solution
+        return self.solution is solution
+
+
 class RectanglePacker(OptimizationProblem):
     """
     Optimization problem class for rectangle packing problem
@@ -160,19 +438,194 @@ class RectanglePacker(OptimizationProblem):
     Attributes:
         items (List[Rectangle]): list of rectangles that will be packed
         container_size (int): size of the box container
+        placement_policy (PlacementPolicy): box selection of add_to_solution, either the first or the tightest box that fits
+        sort_orders (dict): cached permutations of the items by order name
     """
 
-    def __init__(self, items: List[Rectangle], container_size: int):
+    def __init__(self, items: List[Rectangle], container_size: int, placement_policy: PlacementPolicy = PlacementPolicy.FIRST_FIT):
         self.items = items
         self.container_size = container_size
+        self.placement_policy = placement_policy
+        self.construction = None
+        self.sort_orders = {}
+        self.order_items = None
+        self.order_widths = None
+        self.order_heights = None
 
     def __repr__(self):
         return f"RectanglePacker(items={self.items}, container_size={self.container_size}"
 
+    def start_construction(self, items: List[Rectangle]):
+        """
+        Starts a constructive pass over the given items. Until all of them are placed, boxes that can not take 
+        the smallest remaining item are closed and skipped by add_to_solution.
+
+        Args:
+            items (List[Rectangle]): items that will be added to a new solution
+        """
+        self.construction = ConstructionPass(items)
+
+    def get_sort_order(self, order_name: str):
+        """
+        Returns the permutation of a greedy strategy or rule. The dimensions of the items are collected once 
+        at the first request and every permutation is only computed once.
+
+        Args:
+            order_name (str): Greedy strategy or rule name
+
+        Returns:
+            np.ndarray: indices into self.order_items in sorted order, None if the name is unknown
+        """
+        from rectangle_packer_classes.helpers import compute_sort_order, item_dimensions
+
+        if self.order_items is None:
+            self.order_items = list(self.items)
+            self.order_widths, self.order_heights = item_dimensions(self.order_items)
+        
+        if order_name not in self.sort_orders:
+            self.sort_orders[order_name] = compute_sort_order(self.order_widths, self.order_heights, order_name)
+        return self.sort_orders[order_name]
+
+    def sorted_items(self, order_name, apply_order):
+        """
+        Returns the items in the order of a greedy strategy or rule, using the cached permutation.
+
+        Args:
+            order_name (str): Greedy strategy or rule name
+            apply_order (function): order function, used for names without a permutation
+
+        Returns:
+            List[Rectangle]: sorted items
+        """
+        order = self.get_sort_order(order_name)
+        if order is None:
+            return apply_order(self.items, order_name)
+        return [self.order_items[i] for i in order]
+
+    def group_items(self, items: List[Rectangle]):
+        """
+        Groups consecutive rectangles with the same width and height, so they can be placed with one scan per box.
+
+        Args:
+            items (List[Rectangle]): rectangles in placement order
+
+        Returns:
+            List[List[Rectangle]]: consecutive groups of identical rectangles
+        """
+        return [list(group) for _, group in itertools.groupby(items, key=lambda item: (item.width, item.height))]
+
+    def add_batch_to_solution(self, solution: RecPac_Solution, items: List[Rectangle]):
+        """
+        Places a group of identical rectangles with the same result as adding them one by one with first fit.
+        Each box is filled with as many rectangles of the group as possible in one scan, before the next box is tried,
+        because a box that can not take the next rectangle will not be able to take any later one of the group.
+        With the best fit policy, the rectangles are added one by one.
+
+        Args:
+            solution (RecPac_Solution): solution that the items will be added to 
+            items (List[Rectangle]): rectangles with the same width and height
+
+        Returns:
+            solution (RecPac_Solution): solution with all items packed
+        """
+        if solution is None:
+            return None
+        if len(items) == 1 or self.placement_policy != PlacementPolicy.FIRST_FIT:
+            for item in items:
+                solution = self.add_to_solution(solution, item)
+            return solution
+
+        construction = self.construction if self.construction is not None and self.construction.is_running_on(solution) else None
+        item_area = items[0].width * items[0].height
+        
+        # fill the open boxes in their order
+        placed = 0
+        open_boxes = list(construction.active_boxes if construction is not None else solution.boxes)
+        for box in open_boxes:
+            if placed == len(items):
+                break
+            if box.free_area >= item_area and (items[0].width, items[0].height) not in box.no_fit:
+                placed = self.fill_box(box, items, placed, construction)
+
+        # open new boxes for the rest of the group
+        while placed < len(items):
+            item = items[placed]
+            new_box = Box(self.container_size)
+            item.x, item.y = 0, 0
+            new_box.add_item(item)
+            solution.add_box(new_box)
+            if construction is not None:
+                construction.box_opened(new_box)
+                construction.item_placed(item, new_box)
+            placed = self.fill_box(new_box, items, placed + 1, construction)
+
+        return solution
+
+    def polish_solution(self, solution: RecPac_Solution):
+        """
+        Compacts every box of the final solution towards the origin (see Box.compact).
+
+        Args:
+            solution (RecPac_Solution): final solution of an algorithm, it is changed in place
+
+        Returns:
+            RecPac_Solution: the compacted solution
+        """
+        if solution is not None:
+            for box in solution.boxes:
+                box.compact()
+        return solution
+
+    def fill_box(self, box: Box, items: List[Rectangle], start: int, construction=None):
+        """
+        Places the identical rectangles items[start:] into the box, until the box can not take another one.
+
+        Args:
+            box (Box): box that will be filled
+            items (List[Rectangle]): rectangles with the same width and height
+            start (int): index of the first rectangle, that is not placed yet
+            construction (ConstructionPass, optional): constructive pass, that is notified about the placements
+
+        Returns:
+            int: index of the first rectangle, that is still not placed
+        """
+        if start == len(items):
+            return start
+        
+        # all unrotated positions are taken first, because once the unrotated search fails, it fails for every further rectangle as well.
+        # the search continues at the last found position, since every position before it is still blocked
+        width, height = items[start].width, items[start].height
+        for rotated in (False, True):
+            if rotated and width == height:
+                break
+            item_width, item_height = (height, width) if rotated else (width, height)
+            x, y = 0, 0
+            while start < len(items):
+                x, y = scan_occupancy_pyramid(*box.occupancy_pyramid(), self.container_size, item_width, item_height, x, y)
+                self.stats.count("placement_calls")
+                if x == -1:
+                    self.stats.count("placement_failures")
+                    break
+                item = items[start]
+                item.x, item.y = int(x), int(y)
+                item.width, item.height = item_width, item_height
+                box.add_item(item)
+                if construction is not None:
+                    construction.item_placed(item, box)
+                start += 1
+
+        # the box is full for this size, remember it after the last change of the box
+        if start < len(items):
+            box.no_fit.add((width, height))
+            box.no_fit.add((height, width))
+        return start
+
     def add_to_solution(self, solution: RecPac_Solution, item: Rectangle):
         """
         Attempts to place a rectangle into an existing box.
         If no space is found, a new box is created.
+        Only boxes with enough free area are probed, either in their order (first fit) or the tightest box first (best fit).
+        During a constructive pass, closed boxes are not probed at all, and boxes where the same size did not fit since their last change are skipped.
 
         Args:
             solution (RecPac_Solution): solution that the item will be added to 
@@ -184,15 +637,33 @@ class RectanglePacker(OptimizationProblem):
         if solution is None:
             return None
 
+        construction = self.construction if self.construction is not None and self.construction.is_running_on(solution) else None
+
+        # only boxes with enough free area can hold the item
+        item_area = item.width * item.height
+        if self.placement_policy == PlacementPolicy.BEST_FIT:
+            candidate_boxes = solution.free_index.fitting_boxes(item_area)
+        else:
+            open_boxes = construction.active_boxes if construction is not None else solution.boxes
+            candidate_boxes = (box for box in open_boxes if box.free_area >= item_area)
+
         # iterate through boxes to find a assignment for the item
-        for box in solution.boxes:
+        for box in candidate_boxes:
+            if (item.width, item.height) in box.no_fit:
+                self.stats.count("no_fit_skips")
+                continue
             x, y, rotated = self.find_valid_assignment(box, item)
             
-            if x is not None and y is not None:
+            if x is None or y is None:
+                box.no_fit.add((item.width, item.height))
+                box.no_fit.add((item.height, item.width))
+            else:
                 item.x, item.y = x, y
                 if rotated:
                     item.width, item.height = item.height, item.width  # Apply rotation, if it was rotated to place
                 box.add_item(item)
+                if construction is not None:
+                    construction.item_placed(item, box)
                 return solution
 
         # No existing box was able to fit the rectangle, so a new one will be added
@@ -200,12 +671,17 @@ class RectanglePacker(OptimizationProblem):
         item.x, item.y = 0, 0
         new_box.add_item(item)
         solution.add_box(new_box)
+        self.stats.count("boxes_opened")
+        if construction is not None:
+            construction.box_opened(new_box)
+            construction.item_placed(item, new_box)
 
         return solution
 
     def find_valid_assignment(self, container: Container, item: Item, overlap_percentage: float = 0.0):
         """
-        Prepare data to pass it to numba method and find positions (with rotations if needed)
+        Prepare data to pass it to numba method and find positions (with rotations if needed).
+        Without overlaps, the occupancy pyramid of the box is searched coarse to fine, otherwise the grid is built from the rectangles.
 
         Args:
             container (Container): Box to place the item in
@@ -215,6 +691,20 @@ class RectanglePacker(OptimizationProblem):
         Returns:
             tuple: (x, y, rotated) where x, y are the coordinates and rotated is a boolean, indicating rotation.
         """
+        self.stats.count("placement_calls")
+
+        # without overlaps, the persistent occupancy pyramid of the box is searched
+        if overlap_percentage == 0.0:
+            occupancy = container.occupancy_pyramid()
+            x, y = scan_occupancy_pyramid(*occupancy, self.container_size, item.width, item.height)
+            if x != -1:
+                return int(x), int(y), False
+            if item.width != item.height:
+                x, y = scan_occupancy_pyramid(*occupancy, self.container_size, item.height, item.width)
+                if x != -1:
+                    return int(x), int(y), True
+            self.stats.count("placement_failures")
+            return None, None, False
 
         # Convert Box data to NumPy arrays for Numba processing
         items_x = np.array([r.x for r in container.items], dtype=np.int32)
@@ -233,8 +723,19 @@ class RectanglePacker(OptimizationProblem):
             if x != -1:
                 return x, y, True # rotation needed
 
+        self.stats.count("placement_failures")
         return None, None, False # no valid position found
     
+    def lower_bound(self):
+        """
+        Computes a lower bound for the number of boxes, that are needed to pack all items, based on their total area.
+
+        Returns:
+            int: minimum number of boxes for any valid solution
+        """
+        total_area = sum(item.width * item.height for item in self.items)
+        return math.ceil(total_area / self.container_size**2)
+    
     def generate_item_samples(self, rectangles, n=4):
         """
         splits the list of rectangles into n approximately equal sublists.
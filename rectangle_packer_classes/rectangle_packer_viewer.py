@@ -1,11 +1,16 @@
 import json
+import queue
+import threading
+import time
 from typing import List
 from PIL import Image, ImageTk
 from tkinter import ttk, filedialog
 import tkinter as tk
 
-from rectangle_packer_classes.problem_classes import Rectangle
-from rectangle_packer_classes.helpers import Neighborhoods, generate_instances, GreedyStrategy, Rules
+from rectangle_packer_classes.problem_classes import Rectangle, PlacementPolicy
+from rectangle_packer_classes.archive import ARCHIVE_EXTENSION, is_archive, read_instance_file, write_instance_file
+from rectangle_packer_classes.helpers import Neighborhoods, generate_instances, GreedyStrategy, Rules, quick_copy
+from base_classes.types import CancellationToken
 from base_classes.ui_classes import GUI, Tooltip
 
 
@@ -13,12 +18,14 @@ class RectanglePackerVisualizer(GUI):
     """A GUI for visualizing optimization algorithms for rectangle packing.
     Allows configuration and execution of various algorithms with step-wise visualization
     """
-    def __init__(self, root, greedy_algorithm, local_search, backtracking, simulated_annealing):
+    def __init__(self, root, greedy_algorithm, local_search, backtracking, simulated_annealing, portfolio=None, decomposition=None):
         self.root = root
         self.greedy_algorithm = greedy_algorithm
         self.local_search = local_search
         self.backtracking = backtracking
         self.simulated_annealing = simulated_annealing
+        self.portfolio = portfolio
+        self.decomposition = decomposition
         
         # state management
         self.can_export_rectangles = "disabled"
@@ -35,6 +42,13 @@ class RectanglePackerVisualizer(GUI):
         self.max_zoom_steps = 4
         self.solution = None
         
+        # background execution of the solvers
+        self.worker = None
+        self.cancel_token = None
+        self.progress_queue = queue.Queue()
+        self.poll_interval_ms = 50
+        self.progress_interval = 0.1 # minimum seconds between two streamed canvas updates
+        
         # init ui
         self.setup_ui()
     
@@ -89,6 +103,11 @@ class RectanglePackerVisualizer(GUI):
         tk.Label(frame_inputs, text="Boxlänge L:").grid(row=5, column=0)
         self.entry_box_length = tk.Entry(frame_inputs)
         self.entry_box_length.grid(row=5, column=1, pady=5)
+
+        tk.Label(frame_inputs, text="Platzierung wählen: ").grid(row=6, column=0, padx=5)
+        self.placement_policy_selector = ttk.Combobox(frame_inputs, state="readonly", values=[policy.value for policy in PlacementPolicy])
+        self.placement_policy_selector.set(PlacementPolicy.FIRST_FIT.value)
+        self.placement_policy_selector.grid(row=6, column=1, pady=5)
         
         # ===========================
         # Multi-Select Dropdown for Colors
@@ -111,7 +130,9 @@ class RectanglePackerVisualizer(GUI):
         self.color_multiselect.config(yscrollcommand=scrollbar.set)
 
         self.algo_select_label = tk.Label(frame_inputs, text="Algorithmus wählen: ").grid(row=7, column=0, padx=5)
-        self.algo_selector = ttk.Combobox(frame_inputs, values=["Greedy", "Lokale Suche", "Backtracking", "Simulated Annealing"], state="readonly")
+        algorithms = ["Greedy", "Lokale Suche", "Backtracking", "Simulated Annealing"] + (["Portfolio"] if self.portfolio is not None else [])
+        algorithms += ["Zerlegung (große Instanzen)"] if self.decomposition is not None else []
+        self.algo_selector = ttk.Combobox(frame_inputs, values=algorithms, state="readonly")
         self.algo_selector.set("Greedy")
         self.algo_selector.grid(row=7, column=1, pady=5)
 
@@ -125,7 +146,7 @@ class RectanglePackerVisualizer(GUI):
 
         self.neighborhood_label = ttk.Label(frame_inputs, text="Nachbarschaft wählen")
         self.neighborhood_label.grid(row=9, column=0, padx=5)
-        self.local_search_neighborhood_selector = ttk.Combobox(frame_inputs, state="readonly", values=["Geometriebasiert", "Regelbasiert", "Überlappungen teilweise zulassen"])
+        self.local_search_neighborhood_selector = ttk.Combobox(frame_inputs, state="readonly", values=["Geometriebasiert", "Regelbasiert", "Überlappungen teilweise zulassen", "Adaptiv (alle Nachbarschaften)", "VND (alle Nachbarschaften nacheinander)", "Boxen auflösen"])
         self.local_search_neighborhood_selector.set("Geometriebasiert")
         self.local_search_neighborhood_selector.grid(row=9, column=1, pady=5)
         self.local_search_neighborhood_selector.grid_remove()
@@ -144,6 +165,12 @@ class RectanglePackerVisualizer(GUI):
         self.local_search_max_iterations = tk.Entry(frame_inputs)
         self.local_search_max_iterations.grid(row=11, column=1)
         self.local_search_max_iterations.insert(0, "21")
+
+        self.local_search_num_neighbors_label = tk.Label(frame_inputs, text="Nachbarn pro Iteration")
+        self.local_search_num_neighbors_label.grid(row=12, column=0, pady=5)
+        self.local_search_num_neighbors = tk.Entry(frame_inputs)
+        self.local_search_num_neighbors.grid(row=12, column=1)
+        self.local_search_num_neighbors.insert(0, "1")
         
         self.start_temperature_label = tk.Label(frame_inputs, text="Starttemperatur")
         self.start_temperature_label.grid(row=10, column=0)
@@ -200,8 +227,11 @@ class RectanglePackerVisualizer(GUI):
         btn_generate = tk.Button(frame_buttons, text="Rechtecke generieren", command=self.generate_rectangles_clicked)
         btn_generate.grid(row=0, column=0, padx=5)
 
-        btn_run = tk.Button(frame_buttons, text="Algorithmus ausführen", command=self.run_algorithm)
-        btn_run.grid(row=1, column=0, padx=5)
+        self.btn_run = tk.Button(frame_buttons, text="Algorithmus ausführen", command=self.run_algorithm)
+        self.btn_run.grid(row=1, column=0, padx=5)
+        
+        self.btn_cancel = tk.Button(frame_buttons, text="Abbrechen", state="disabled", command=self.cancel_algorithm)
+        self.btn_cancel.grid(row=2, column=0, padx=5)
         
         self.btn_import = tk.Button(frame_buttons, image=self.import_icon, width=30, borderwidth=0,command=self.import_rectangles)
         self.btn_import.grid(row=1, column=1, padx=5)
@@ -405,7 +435,7 @@ class RectanglePackerVisualizer(GUI):
     # =======================================
          
     def update_algorithm(self, *args):
-        if self.algo_selector.get() == "Greedy":
+        if self.algo_selector.get() in ("Greedy", "Zerlegung (große Instanzen)"):
             self.show_greedy_widgets()
             self.hide_local_search_widgets()
             self.hide_simulated_annealing_widgets()
@@ -427,6 +457,12 @@ class RectanglePackerVisualizer(GUI):
             self.hide_greedy_widgets()
             self.show_simulated_annealing_widgets()
             self.hide_local_search_widgets()
+        elif self.algo_selector.get() == "Portfolio":
+            self.hide_greedy_widgets()
+            self.hide_local_search_widgets()
+            self.hide_simulated_annealing_widgets()
+            self.max_time.grid()
+            self.max_time_label.grid()
            
     def validate_inputs(self):
         errors = []
@@ -453,6 +489,9 @@ class RectanglePackerVisualizer(GUI):
                 max_iterations = int(self.local_search_max_iterations.get())
                 if max_iterations < 1:
                     errors.append("Es muss mindestens eine Iteration ausgeführt werden")
+                num_neighbors = int(self.local_search_num_neighbors.get())
+                if num_neighbors < 1:
+                    errors.append("Es muss mindestens ein Nachbar pro Iteration erzeugt werden")
 
         except ValueError:
             errors.append("Bitte geben Sie gültige Zahlen ein und befüllen Sie alle Felder")
@@ -484,7 +523,15 @@ class RectanglePackerVisualizer(GUI):
             self.label_status.config(text=f"{n} Rechtecke generiert!")
         
     def run_algorithm(self):
+        """
+        Starts the selected algorithm in a worker thread. The inputs are read on the tkinter main thread,
+        the progress of the run is streamed through a queue and drawn while the run continues.
+        """
+        if self.worker is not None and self.worker.is_alive():
+            return
+        
         algorithm = self.algo_selector.get()
+        placement_policy = self.placement_policy_selector.get()
         self.interim_solutions = []
         self.interim_index = 0
         self.update_progress_bar()
@@ -493,41 +540,145 @@ class RectanglePackerVisualizer(GUI):
         self.rectangle_colors = {}
         
         if algorithm == "Greedy":
-            self.solution, self.interim_solutions = self.greedy_algorithm(
+            strategy = self.greedy_strat.get()
+            job = lambda token, on_progress: self.greedy_algorithm(
                 self.instances, 
                 self.box_size, 
-                self.greedy_strat.get()
+                strategy,
+                placement_policy=placement_policy,
+                cancel_token=token,
+                on_progress=on_progress
             )
         elif algorithm == "Lokale Suche":
             neighborhood = self.local_search_neighborhood_selector.get()
             rulebased_strategy = self.rulebased_strat.get() if neighborhood == Neighborhoods.RULE.value else ""
-            self.solution, self.interim_solutions = self.local_search(
+            max_iterations = int(self.local_search_max_iterations.get())
+            num_neighbors = int(self.local_search_num_neighbors.get())
+            job = lambda token, on_progress: self.local_search(
                 self.instances, 
                 self.box_size, 
                 neighborhood,
                 rulebased_strategy,
-                int(self.local_search_max_iterations.get())
+                max_iterations,
+                num_neighbors,
+                placement_policy=placement_policy,
+                cancel_token=token,
+                on_progress=on_progress
             )
         elif algorithm == "Backtracking":
-            self.solution, self.interim_solutions = self.backtracking(self.instances, self.box_size)
+            job = lambda token, on_progress: self.backtracking(self.instances, self.box_size, placement_policy=placement_policy, cancel_token=token, on_progress=on_progress)
         elif algorithm == "Simulated Annealing":
-            self.run_simulated_annealing()
-        
-        self.interim_index = len(self.interim_solutions)-1
-        self.remove_duplicates()
-        self.update_progress_bar()
-        self.update_position_label()
-        self.draw()
-
-    def run_simulated_annealing(self):
+            job = self.prepare_simulated_annealing(placement_policy)
+        elif algorithm == "Portfolio":
+            max_time = int(self.max_time.get())
+            job = lambda token, on_progress: self.portfolio(self.instances, self.box_size, max_time, placement_policy=placement_policy, cancel_token=token, on_progress=on_progress)
+        elif algorithm == "Zerlegung (große Instanzen)":
+            strategy = self.greedy_strat.get()
+            job = lambda token, on_progress: self.decomposition(self.instances, self.box_size, strategy, placement_policy=placement_policy, cancel_token=token, on_progress=on_progress)
+        
+        self.cancel_token = CancellationToken()
+        self.btn_run.config(state="disabled")
+        self.btn_cancel.config(state="normal")
+        self.label_status.config(text="Status: Algorithmus läuft...")
+        
+        self.worker = threading.Thread(target=self.run_in_background, args=(job, self.cancel_token), daemon=True)
+        self.worker.start()
+        self.root.after(self.poll_interval_ms, self.poll_progress)
+
+    def prepare_simulated_annealing(self, placement_policy):
         neighborhood = Neighborhoods.GEOMETRY.value
         start_temp = int(self.start_temperature.get())
         end_temp = int(self.end_temperature.get())
         cool_down_rate = int(self.cool_rate.get())
         max_time = int(self.max_time.get())
         constant = int(self.cool_rate_constant.get())
-        rulebased_strategy = self.rulebased_strat.get() if neighborhood == Neighborhoods.RULE.value else ""
-        self.solution, self.interim_solutions = self.simulated_annealing(self.instances, self.box_size, neighborhood, rulebased_strategy, start_temp, end_temp, (100-cool_down_rate)/100, constant, max_time)    
+        return lambda token, on_progress: self.simulated_annealing(self.instances, self.box_size, neighborhood, "", start_temp, end_temp, (100-cool_down_rate)/100, constant, max_time,
+                                                                   placement_policy=placement_policy, cancel_token=token, on_progress=on_progress)
+
+    def run_in_background(self, job, cancel_token):
+        """
+        Runs a solver job on the worker thread. It never touches tkinter widgets, 
+        every result is handed to the main thread through the progress queue.
+
+        Args:
+            job (function): runner call that accepts a cancel token and a progress callback
+            cancel_token (CancellationToken): token, that is cancelled by the cancel button
+        """
+        last_update = 0.0
+        
+        def on_progress(event):
+            nonlocal last_update
+            # the solver waits while the callback runs, so its solution can be copied safely here
+            if event.final or time.time() - last_update >= self.progress_interval:
+                last_update = time.time()
+                if event.solution is not None:
+                    self.progress_queue.put(("progress", quick_copy(event.solution), event.elapsed_time))
+        
+        try:
+            solution, interim_solutions = job(cancel_token, on_progress)
+            self.progress_queue.put(("done", solution, interim_solutions))
+        except Exception as e:
+            self.progress_queue.put(("error", e, None))
+
+    def poll_progress(self):
+        """
+        Drains the progress queue on the tkinter main thread and redraws the canvas with the latest solution.
+        Reschedules itself with root.after until the worker has reported its result.
+        """
+        latest_progress = None
+        finished = None
+        
+        while True:
+            try:
+                message = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                latest_progress = message
+            else:
+                finished = message
+        
+        if finished is not None:
+            self.finish_run(finished)
+            return
+        
+        if latest_progress is not None:
+            _, self.solution, elapsed_time = latest_progress
+            self.label_status.config(text=f"Status: Algorithmus läuft... ({elapsed_time:.1f} Sekunden)")
+            self.draw()
+        
+        self.root.after(self.poll_interval_ms, self.poll_progress)
+
+    def finish_run(self, message):
+        kind, result, interim_solutions = message
+        self.btn_run.config(state="normal")
+        self.btn_cancel.config(state="disabled")
+        
+        if kind == "error":
+            self.error_label.config(text=f"Fehler beim Ausführen: {result}", fg="red")
+            self.label_status.config(text="Status: Bereit")
+            return
+        
+        was_cancelled = self.cancel_token is not None and self.cancel_token.cancelled
+        self.label_status.config(text="Status: Abgebrochen (Zwischenergebnis)" if was_cancelled else "Status: Fertig")
+        
+        self.solution = result
+        self.interim_solutions = interim_solutions
+        self.interim_index = len(self.interim_solutions)-1
+        self.remove_duplicates()
+        self.update_progress_bar()
+        self.update_position_label()
+        if self.solution is not None:
+            self.draw()
+
+    def cancel_algorithm(self):
+        """
+        Cancels the running algorithm. The worker stops after its current step and reports its best solution so far.
+        """
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+            self.btn_cancel.config(state="disabled")
+            self.label_status.config(text="Status: Wird abgebrochen...")
 
     # =======================================
     #         Visualization Methods
@@ -604,6 +755,8 @@ class RectanglePackerVisualizer(GUI):
         self.local_search_neighborhood_selector.grid()
         self.local_search_max_iterations.grid()
         self.local_search_max_iterations_label.grid()
+        self.local_search_num_neighbors.grid()
+        self.local_search_num_neighbors_label.grid()
         self.neighborhood_label.grid()
         self.local_search_max_iterations_is_visible = True
     
@@ -627,6 +780,8 @@ class RectanglePackerVisualizer(GUI):
         self.local_search_neighborhood_selector.grid_remove()
         self.local_search_max_iterations.grid_remove()
         self.local_search_max_iterations_label.grid_remove()
+        self.local_search_num_neighbors.grid_remove()
+        self.local_search_num_neighbors_label.grid_remove()
         self.neighborhood_label.grid_remove()
         self.local_search_max_iterations_is_visible = False
         self.rulebased_strat.grid_remove()
@@ -691,64 +846,75 @@ class RectanglePackerVisualizer(GUI):
     def import_rectangles(self):
         """
         Method that allows the user to import a list of rectangles, which has been exported before.
+        Accepts JSON files and rectangle archives (.rpk).
         """
         # open file dialog
-        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
+        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json"), ("Rechteck-Archiv", "*" + ARCHIVE_EXTENSION)])
         if file_path:
             try:
-                with open(file_path, "r", encoding="utf-8") as file:
-                    # read file data
-                    data = json.load(file)
+                if is_archive(file_path):
+                    rectangles, box_length, data = read_instance_file(file_path)
+                    data["box_length"] = box_length
+                else:
+                    with open(file_path, "r", encoding="utf-8") as file:
+                        # read file data
+                        data = json.load(file)
+                    rectangles = [Rectangle(rect[0], rect[1], rect[2], rect[3], rect[4]) for rect in data.get("rectangles", [])]
                     
-                    # save data into the input boxes and configuration
-                    self.instances = [Rectangle(rect[0], rect[1], rect[2], rect[3], rect[4]) for rect in data.get("rectangles", [])]
-                    self.box_size = data.get("box_length", 0)
-                    
-                    self.entry_num_rectangles.delete(0, tk.END)
-                    self.entry_num_rectangles.insert(0, data.get("num_rectangles", ""))
-                    
-                    self.entry_min_width.delete(0, tk.END)
-                    self.entry_min_width.insert(0, data.get("min_width", ""))
-                    
-                    self.entry_max_width.delete(0, tk.END)
-                    self.entry_max_width.insert(0, data.get("max_width", ""))
-                    
-                    self.entry_min_height.delete(0, tk.END)
-                    self.entry_min_height.insert(0, data.get("min_height", ""))
-                    
-                    self.entry_max_height.delete(0, tk.END)
-                    self.entry_max_height.insert(0, data.get("max_height", ""))
-                    
-                    self.entry_box_length.delete(0, tk.END)
-                    self.entry_box_length.insert(0, self.box_size)
-                    
-                    self.label_status.config(text="Rechtecke erfolgreich importiert!")
+                # save data into the input boxes and configuration
+                self.instances = rectangles
+                self.box_size = data.get("box_length", 0)
+                
+                self.entry_num_rectangles.delete(0, tk.END)
+                self.entry_num_rectangles.insert(0, data.get("num_rectangles", ""))
+                
+                self.entry_min_width.delete(0, tk.END)
+                self.entry_min_width.insert(0, data.get("min_width", ""))
+                
+                self.entry_max_width.delete(0, tk.END)
+                self.entry_max_width.insert(0, data.get("max_width", ""))
+                
+                self.entry_min_height.delete(0, tk.END)
+                self.entry_min_height.insert(0, data.get("min_height", ""))
+                
+                self.entry_max_height.delete(0, tk.END)
+                self.entry_max_height.insert(0, data.get("max_height", ""))
+                
+                self.entry_box_length.delete(0, tk.END)
+                self.entry_box_length.insert(0, self.box_size)
+                
+                self.label_status.config(text="Rechtecke erfolgreich importiert!")
             except Exception as e:
                 self.error_label.config(text=f"Fehler beim Importieren: {e}", fg="red")
     
     def export_rectangles(self):
         """
-        Method that allows the user to export the last generated list of rectangles, for later import
+        Method that allows the user to export the last generated list of rectangles, for later import.
+        The file extension selects the format, JSON or rectangle archive (.rpk).
         """
         default_filename = "rectangles.json"
         file_path = filedialog.asksaveasfilename(
             initialfile=default_filename,
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
+            filetypes=[("JSON files", "*.json"), ("Rechteck-Archiv", "*" + ARCHIVE_EXTENSION)]
         )
         if file_path:
             try:
-                with open(file_path, "w", encoding="utf-8") as file:
-                    data = {
-                        "rectangles": [(instance.x, instance.y, instance.width, instance.height, instance.color) for instance in self.instances],
-                        "box_length": self.box_size,
-                        "num_rectangles": len(self.instances),
-                        "min_width": self.entry_min_width.get(),
-                        "max_width": self.entry_max_width.get(),
-                        "min_height": self.entry_min_height.get(),
-                        "max_height": self.entry_max_height.get(),
-                    }
-                    json.dump(data, file)
-                    self.label_status.config(text="Rechtecke erfolgreich exportiert!")
+                data = {
+                    "rectangles": [(instance.x, instance.y, instance.width, instance.height, instance.color) for instance in self.instances],
+                    "box_length": self.box_size,
+                    "num_rectangles": len(self.instances),
+                    "min_width": self.entry_min_width.get(),
+                    "max_width": self.entry_max_width.get(),
+                    "min_height": self.entry_min_height.get(),
+                    "max_height": self.entry_max_height.get(),
+                }
+                if is_archive(file_path):
+                    metadata = {key: value for key, value in data.items() if key not in ("rectangles", "box_length")}
+                    write_instance_file(file_path, self.instances, self.box_size, metadata)
+                else:
+                    with open(file_path, "w", encoding="utf-8") as file:
+                        json.dump(data, file)
+                self.label_status.config(text="Rechtecke erfolgreich exportiert!")
             except Exception as e:
                 self.error_label.config(text=f"Fehler beim Exportieren: {e}", fg="red")
\ No newline at end of file
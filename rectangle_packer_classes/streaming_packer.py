@@ -0,0 +1,144 @@
+import time
+from collections import deque
+from typing import List
+
+from rectangle_packer_classes.problem_classes import Box, Rectangle, RecPac_Solution, RectanglePacker, PlacementPolicy
+
+
+class StreamingPacker:
+    """
+    Online packer for rectangles that arrive one by one or in small batches.
+    Every rectangle is placed immediately with RectanglePacker.add_to_solution, but at most max_open_boxes boxes stay open.
+    If more boxes are open, the fullest open box is closed and handed to the on_box_closed callback, or buffered for drain(),
+    so the memory only depends on the window size and not on the length of the stream.
+
+    Attributes:
+        problem (RectanglePacker): problem instance used for the placements
+        solution (RecPac_Solution): solution that contains the open boxes
+        max_open_boxes (int): maximum number of open boxes
+        on_box_closed (function): callback that receives every closed box, None to buffer them for drain()
+        closed_boxes (deque[Box]): closed boxes, that were not drained yet
+    """
+    def __init__(self, container_size: int, max_open_boxes: int = 4, on_box_closed=None, placement_policy: PlacementPolicy = PlacementPolicy.FIRST_FIT, latency_window: int = 1000):
+        if max_open_boxes < 1:
+            raise ValueError("max_open_boxes must be at least 1")
+        self.problem = RectanglePacker([], container_size, placement_policy)
+        self.solution = RecPac_Solution()
+        self.max_open_boxes = max_open_boxes
+        self.on_box_closed = on_box_closed
+        self.closed_boxes = deque()
+
+        # latency of the placements, the recent ones are kept for percentiles
+        self.items_placed = 0
+        self.boxes_closed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.recent_latencies = deque(maxlen=latency_window)
+
+    def __repr__(self):
+        return f"StreamingPacker(open_boxes={len(self.solution.boxes)}, items_placed={self.items_placed}, boxes_closed={self.boxes_closed})"
+
+    def add(self, item: Rectangle):
+        """
+        Places a rectangle into one of the open boxes or a new box and closes boxes, if the window is exceeded.
+
+        Args:
+            item (Rectangle): rectangle that will be placed (its position is set in place)
+
+        Returns:
+            float: placement latency in seconds
+        """
+        start_time = time.perf_counter()
+        self.problem.add_to_solution(self.solution, item)
+        self.close_overflowing_boxes()
+        latency = time.perf_counter() - start_time
+
+        self.record_latency(latency, 1)
+        return latency
+
+    def add_many(self, items: List[Rectangle]):
+        """
+        Places a small batch of rectangles. Identical rectangles in a row are placed as one group.
+        The latency is measured per group, so every rectangle of a group is recorded with the average latency of its group.
+
+        Args:
+            items (List[Rectangle]): rectangles that will be placed in the given order
+
+        Returns:
+            float: average placement latency per rectangle in seconds
+        """
+        if not items:
+            return 0.0
+
+        total_latency = 0.0
+        for group in self.problem.group_items(items):
+            start_time = time.perf_counter()
+            self.problem.add_batch_to_solution(self.solution, group)
+            self.close_overflowing_boxes()
+            group_latency = time.perf_counter() - start_time
+
+            self.record_latency(group_latency / len(group), len(group))
+            total_latency += group_latency
+        return total_latency / len(items)
+
+    def close_overflowing_boxes(self):
+        """Closes the fullest open boxes, until at most max_open_boxes are open."""
+        while len(self.solution.boxes) > self.max_open_boxes:
+            # the free area index keeps the fullest box first
+            self.close_box(self.solution.free_index.boxes[0])
+
+    def close_box(self, box: Box):
+        """
+        Removes a box from the open boxes and emits it.
+
+        Args:
+            box (Box): open box that will be closed
+        """
+        self.solution.remove_box(box)
+        self.boxes_closed += 1
+
+        if self.on_box_closed is not None:
+            self.on_box_closed(box)
+        else:
+            self.closed_boxes.append(box)
+
+    def flush(self):
+        """Closes all open boxes, e.g. at the end of the stream."""
+        for box in list(self.solution.boxes):
+            self.close_box(box)
+
+    def drain(self):
+        """
+        Yields the closed boxes, that were buffered since the last call.
+
+        Yields:
+            Box: closed box
+        """
+        while self.closed_boxes:
+            yield self.closed_boxes.popleft()
+
+    def record_latency(self, latency: float, count: int):
+        self.items_placed += count
+        self.total_latency += latency * count
+        self.max_latency = max(self.max_latency, latency)
+        self.recent_latencies.extend([latency] * min(count, self.recent_latencies.maxlen))
+
+    def latency_stats(self):
+        """
+        Summarizes the placement latencies.
+
+        Returns:
+            dict: number of placed items and closed boxes, mean and max latency, and the 50th/95th percentile of the recent placements (in seconds).
+                  Rectangles placed with add_many count with the average latency of their group (see add_many)
+        """
+        recent = sorted(self.recent_latencies)
+        percentile = lambda p: recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+        return {
+            "items_placed": self.items_placed,
+            "boxes_closed": self.boxes_closed,
+            "open_boxes": len(self.solution.boxes),
+            "mean_latency": self.total_latency / self.items_placed if self.items_placed else 0.0,
+            "max_latency": self.max_latency,
+            "p50_latency": percentile(0.5),
+            "p95_latency": percentile(0.95),
+        }
@@ -33,7 +33,7 @@ def int_to_color(color_int):
     return int_map.get(color_int, "black")  # Default to black if not found
 
 
-@njit
+@njit(nogil=True)
 def find_valid_assignment_numba(container_size, items_x, items_y, items_width, items_height, item_width, item_height, overlap_percentage):
     """
     Finds a valid position for a new rectangle using an occupancy grid approach and utilizing njit.
@@ -49,16 +49,38 @@ def find_valid_assignment_numba(container_size, items_x, items_y, items_width, i
     """
 
     occupancy_grid = np.zeros((container_size, container_size), dtype=np.uint8)
+    fill_occupancy_grid(occupancy_grid, items_x, items_y, items_width, items_height)
 
-    # fill occupancy grid with existing rectangles
+    # compute integral image for fast overlap calculations
+    integral_image = np.zeros_like(occupancy_grid, dtype=np.int32)
+    compute_integral_image(occupancy_grid, integral_image)
+
+    return scan_integral_image(integral_image, container_size, item_width, item_height, overlap_percentage)
+
+@njit(nogil=True)
+def fill_occupancy_grid(occupancy_grid, items_x, items_y, items_width, items_height):
+    """
+    Marks the cells of the given rectangles as occupied.
+
+    Args:
+        occupancy_grid (np.ndarray): grid, that will be marked with 1 for occupied cells
+        items_x, items_y, items_width, items_height (np.array): positions and sizes of the rectangles
+    """
     for i in range(len(items_x)):
         x1, y1 = items_x[i], items_y[i]
         x2, y2 = x1 + items_width[i], y1 + items_height[i]
         occupancy_grid[x1:x2, y1:y2] = 1
 
-    # compute integral image for fast overlap calculations
-    integral_image = np.zeros_like(occupancy_grid, dtype=np.int32)
+@njit(nogil=True)
+def compute_integral_image(occupancy_grid, integral_image):
+    """
+    Computes the integral image of an occupancy grid into a preallocated array.
 
+    Args:
+        occupancy_grid (np.ndarray): grid with 1 for occupied and 0 for free cells
+        integral_image (np.ndarray): int32 array of the same shape, that will be overwritten
+    """
+    container_size = occupancy_grid.shape[0]
     for x in range(container_size):
         for y in range(container_size):
             integral_image[x, y] = occupancy_grid[x, y]
@@ -69,6 +91,20 @@ def find_valid_assignment_numba(container_size, items_x, items_y, items_width, i
             if x > 0 and y > 0:
                 integral_image[x, y] -= integral_image[x-1, y-1]
 
+@njit(nogil=True)
+def scan_integral_image(integral_image, container_size, item_width, item_height, overlap_percentage):
+    """
+    Scans all positions row by row and returns the first one, where the rectangle stays within the allowed overlap.
+
+    Args:
+        integral_image (np.ndarray): integral image of the occupancy grid
+        container_size (int): size of the container
+        item_width, item_height (int): dimensions of the rectangle
+        overlap_percentage (float): Allowed overlap percentage
+
+    Returns:
+        tuple: (x, y) position if valid, otherwise (-1, -1).
+    """
     # check for valid positions
     for y in range(container_size - item_height + 1):
         for x in range(container_size - item_width + 1):
@@ -90,7 +126,365 @@ def find_valid_assignment_numba(container_size, items_x, items_y, items_width, i
 
     return -1, -1
 
-@njit 
+@njit(nogil=True)
+def scan_occupancy_grid(occupancy_grid, container_size, item_width, item_height, start_x=0, start_y=0):
+    """
+    Scans all positions row by row and returns the first one, where the rectangle does not overlap any occupied cell.
+    Instead of an integral image, the scan jumps behind the rightmost occupied column, that blocks the current position,
+    because every position up to that column is blocked by the same cell.
+
+    Args:
+        occupancy_grid (np.ndarray): grid with non-zero values for occupied cells
+        container_size (int): size of the container
+        item_width, item_height (int): dimensions of the rectangle
+        start_x, start_y (int, optional): position where the scan starts, all positions before it are skipped. Defaults to 0.
+
+    Returns:
+        tuple: (x, y) position if valid, otherwise (-1, -1).
+    """
+    for y in range(start_y, container_size - item_height + 1):
+        x = start_x if y == start_y else 0
+        while x <= container_size - item_width:
+            blocking_column = -1
+            for cx in range(x + item_width - 1, x - 1, -1):
+                for cy in range(y, y + item_height):
+                    if occupancy_grid[cx, cy] != 0:
+                        blocking_column = cx
+                        break
+                if blocking_column != -1:
+                    break
+            if blocking_column == -1:
+                return x, y
+            x = blocking_column + 1
+    return -1, -1
+
+@njit(nogil=True)
+def build_occupancy_pyramid(container_size, items_x, items_y, items_width, items_height):
+    """
+    Builds the occupancy pyramid of a box: a coverage grid that counts the rectangles on every cell, 
+    and the number of free cells in every 8x8 and 64x64 block.
+
+    Args:
+        container_size (int): size of the container
+        items_x, items_y, items_width, items_height (np.array): positions and sizes of the rectangles in the box
+
+    Returns:
+        tuple: (coverage_grid, free_8, free_64)
+    """
+    coverage_grid = np.zeros((container_size, container_size), dtype=np.uint16)
+    free_8 = np.zeros(((container_size + 7) >> 3, (container_size + 7) >> 3), dtype=np.int32)
+    free_64 = np.zeros(((container_size + 63) >> 6, (container_size + 63) >> 6), dtype=np.int32)
+    
+    # blocks at the border of the grid can have less cells
+    for bx in range(free_8.shape[0]):
+        for by in range(free_8.shape[1]):
+            free_8[bx, by] = min(8, container_size - (bx << 3)) * min(8, container_size - (by << 3))
+    for bx in range(free_64.shape[0]):
+        for by in range(free_64.shape[1]):
+            free_64[bx, by] = min(64, container_size - (bx << 6)) * min(64, container_size - (by << 6))
+
+    for i in range(len(items_x)):
+        mark_occupancy(coverage_grid, free_8, free_64, items_x[i], items_y[i], items_width[i], items_height[i], 1)
+    return coverage_grid, free_8, free_64
+
+@njit(nogil=True)
+def mark_occupancy(coverage_grid, free_8, free_64, x, y, width, height, delta):
+    """
+    Adds (delta=1) or removes (delta=-1) a rectangle from the coverage grid and updates the free cell counts of the blocks.
+
+    Args:
+        coverage_grid, free_8, free_64 (np.ndarray): occupancy pyramid of the box
+        x, y, width, height (int): position and size of the rectangle
+        delta (int): 1 to add, -1 to remove the rectangle
+    """
+    # only the part of the rectangle inside the box is marked, like a slice of the grid would be
+    x_start, x_end = max(x, 0), min(x + width, coverage_grid.shape[0])
+    y_start, y_end = max(y, 0), min(y + height, coverage_grid.shape[1])
+    for cx in range(x_start, x_end):
+        for cy in range(y_start, y_end):
+            if delta > 0:
+                if coverage_grid[cx, cy] == 0:
+                    free_8[cx >> 3, cy >> 3] -= 1
+                    free_64[cx >> 6, cy >> 6] -= 1
+                coverage_grid[cx, cy] += 1
+            else:
+                coverage_grid[cx, cy] -= 1
+                if coverage_grid[cx, cy] == 0:
+                    free_8[cx >> 3, cy >> 3] += 1
+                    free_64[cx >> 6, cy >> 6] += 1
+
+@njit(nogil=True)
+def scan_occupancy_pyramid(coverage_grid, free_8, free_64, container_size, item_width, item_height, start_x=0, start_y=0):
+    """
+    Returns the first position in row by row order, where the rectangle does not overlap any occupied cell, 
+    which is the same position as the exhaustive search finds. The coarse levels only skip positions, that are blocked for sure:
+    rows of full 64 or 8 blocks, and positions whose top left cell lies in a full block. 
+    Free 8 blocks are skipped at once, while the columns of a position are checked at full resolution.
+
+    Args:
+        coverage_grid, free_8, free_64 (np.ndarray): occupancy pyramid of the box
+        container_size (int): size of the container
+        item_width, item_height (int): dimensions of the rectangle
+        start_x, start_y (int, optional): position where the scan starts, all positions before it are skipped. Defaults to 0.
+
+    Returns:
+        tuple: (x, y) position if valid, otherwise (-1, -1).
+    """
+    y = start_y
+    x = start_x
+    checked_row_8 = -1
+    while y <= container_size - item_height:
+        # coarse level: skip rows, where every cell is occupied
+        row_full = True
+        for bx in range(free_64.shape[0]):
+            if free_64[bx, y >> 6] != 0:
+                row_full = False
+                break
+        if row_full:
+            y = ((y >> 6) + 1) << 6
+            x = 0
+            continue
+        if y >> 3 != checked_row_8:
+            checked_row_8 = y >> 3
+            row_full = True
+            for bx in range(free_8.shape[0]):
+                if free_8[bx, y >> 3] != 0:
+                    row_full = False
+                    break
+            if row_full:
+                y = ((y >> 3) + 1) << 3
+                x = 0
+                continue
+
+        while x <= container_size - item_width:
+            # the top left cell lies in a full block
+            if free_64[x >> 6, y >> 6] == 0:
+                x = ((x >> 6) + 1) << 6
+                continue
+            if free_8[x >> 3, y >> 3] == 0:
+                x = ((x >> 3) + 1) << 3
+                continue
+
+            # fine level: find the rightmost blocking column, every position up to it is blocked by the same cell
+            blocking_column = -1
+            for cx in range(x + item_width - 1, x - 1, -1):
+                cy = y
+                while cy < y + item_height:
+                    block_x, block_y = cx >> 3, cy >> 3
+                    if free_8[block_x, block_y] == min(8, container_size - (block_x << 3)) * min(8, container_size - (block_y << 3)):
+                        cy = (block_y + 1) << 3 # free block
+                        continue
+                    if coverage_grid[cx, cy] != 0:
+                        blocking_column = cx
+                        break
+                    cy += 1
+                if blocking_column != -1:
+                    break
+            if blocking_column == -1:
+                return x, y
+            x = blocking_column + 1
+        y += 1
+        x = 0
+    return -1, -1
+
+@njit(nogil=True)
+def greedy_pack_numba(container_size, widths, heights):
+    """
+    Runs the complete ordered first-fit placement of the greedy algorithm in one compiled call.
+
+    Args:
+        container_size (int): size of the container
+        widths, heights (np.array): int32 dimensions of the rectangles in placement order
+
+    Returns:
+        tuple: (x, y, box_id, rotated) arrays, where entry i holds the placement of rectangle i
+    """
+    n = len(widths)
+    xs = np.full(n, -1, dtype=np.int32)
+    ys = np.full(n, -1, dtype=np.int32)
+    box_ids = np.full(n, -1, dtype=np.int32)
+    rotated = np.zeros(n, dtype=np.bool_)
+    order = np.arange(n).astype(np.int32)
+
+    decode_permutation_numba(container_size, widths, heights, order, rotated, xs, ys, box_ids, 0)
+    return xs, ys, box_ids, rotated
+
+@njit(nogil=True)
+def decode_permutation_numba(container_size, widths, heights, order, rotated, xs, ys, box_ids, start, best_fit=False):
+    """
+    Places the rectangles of a permutation like RectanglePacker.add_to_solution one after another, with first fit or best fit.
+    The placements of the positions before start are kept and only the rest is placed, so a permutation can be decoded
+    again from any prefix. Every box keeps its own occupancy grid, so nothing has to be re-marshalled between two items.
+    The grids are allocated for the boxes, that the area of the rectangles needs at least, and grow when more boxes are opened.
+    Boxes are skipped without a grid scan, if their free area is too small, or if a smaller rectangle 
+    has already failed in them since their last change.
+
+    Args:
+        container_size (int): size of the container
+        widths, heights (np.array): int32 dimensions of the rectangles, indexed by rectangle
+        order (np.array): rectangle index at every position of the permutation
+        rotated (np.array): orientation of the rectangle at every position (tried first), updated with the placed orientation
+        xs, ys, box_ids (np.array): placement of every position, the positions before start have to be filled already
+        start (int): first position that is placed
+        best_fit (bool, optional): probes the box with the least free area first (PlacementPolicy.BEST_FIT). Defaults to False.
+
+    Returns:
+        int: number of boxes
+    """
+    n = len(order)
+    num_boxes = 0
+    for p in range(start):
+        num_boxes = max(num_boxes, box_ids[p] + 1)
+
+    # the rectangles need at least as many boxes as their area fills, more grids are added on demand
+    total_area = 0
+    for p in range(n):
+        total_area += np.int64(widths[order[p]]) * np.int64(heights[order[p]])
+    box_area = np.int64(container_size) * np.int64(container_size)
+    capacity = max(num_boxes, (total_area + box_area - 1) // box_area, 1)
+    grids = np.zeros((capacity, container_size, container_size), dtype=np.uint8)
+    free_area = np.zeros(capacity, dtype=np.int64)
+    failed_short = np.zeros(capacity, dtype=np.int32) # smaller side of the last rectangle, that did not fit
+    failed_long = np.zeros(capacity, dtype=np.int32) # larger side of the last rectangle, that did not fit
+    tried = np.full(capacity, -1, dtype=np.int32) # last position, that probed the box in best fit
+
+    # restore the boxes of the prefix
+    free_area[:num_boxes] = box_area
+    for p in range(start):
+        w, h = widths[order[p]], heights[order[p]]
+        if rotated[p]:
+            w, h = h, w
+        grids[box_ids[p], xs[p]:xs[p] + w, ys[p]:ys[p] + h] = 1
+        free_area[box_ids[p]] -= w * h
+
+    for p in range(start, n):
+        w, h = widths[order[p]], heights[order[p]]
+        if rotated[p]:
+            w, h = h, w
+        area = w * h
+        short_side, long_side = min(w, h), max(w, h)
+        box_id = -1
+        x, y = -1, -1
+        is_rotated = False
+
+        b = -1
+        while True:
+            # first fit probes the boxes in their order, best fit the untried box with the least free area
+            if best_fit:
+                b = -1
+                for c in range(num_boxes):
+                    if tried[c] != p and free_area[c] >= area and (b == -1 or free_area[c] < free_area[b]):
+                        b = c
+                if b == -1:
+                    break
+                tried[b] = p
+            else:
+                b += 1
+                if b >= num_boxes:
+                    break
+                if free_area[b] < area:
+                    continue
+            # a rectangle, that covers a rectangle which did not fit in any orientation, does not fit either
+            if failed_short[b] > 0 and short_side >= failed_short[b] and long_side >= failed_long[b]:
+                continue
+
+            x, y = scan_occupancy_grid(grids[b], container_size, w, h)
+            is_rotated = False
+            if x == -1 and w != h:
+                x, y = scan_occupancy_grid(grids[b], container_size, h, w)
+                is_rotated = True
+
+            if x != -1:
+                box_id = b
+                break
+            failed_short[b], failed_long[b] = short_side, long_side
+
+        # no existing box was able to fit the rectangle, so a new one will be added
+        if box_id == -1:
+            if num_boxes == capacity:
+                capacity += capacity // 4 + 1
+                new_grids = np.zeros((capacity, container_size, container_size), dtype=np.uint8)
+                new_grids[:num_boxes] = grids[:num_boxes]
+                grids = new_grids
+                new_free_area = np.zeros(capacity, dtype=np.int64)
+                new_free_area[:num_boxes] = free_area[:num_boxes]
+                free_area = new_free_area
+                new_failed_short = np.zeros(capacity, dtype=np.int32)
+                new_failed_short[:num_boxes] = failed_short[:num_boxes]
+                failed_short = new_failed_short
+                new_failed_long = np.zeros(capacity, dtype=np.int32)
+                new_failed_long[:num_boxes] = failed_long[:num_boxes]
+                failed_long = new_failed_long
+                new_tried = np.full(capacity, -1, dtype=np.int32)
+                new_tried[:num_boxes] = tried[:num_boxes]
+                tried = new_tried
+            box_id = num_boxes
+            num_boxes += 1
+            free_area[box_id] = box_area
+            x, y = 0, 0
+            is_rotated = False
+
+        placed_w, placed_h = (h, w) if is_rotated else (w, h)
+        grids[box_id, x:x + placed_w, y:y + placed_h] = 1
+        free_area[box_id] -= area
+        failed_short[box_id], failed_long[box_id] = 0, 0
+
+        xs[p], ys[p], box_ids[p] = x, y, box_id
+        if is_rotated:
+            rotated[p] = not rotated[p]
+
+    return num_boxes
+
+@njit(nogil=True)
+def compact_numba(container_size, items_x, items_y, items_width, items_height, order):
+    """
+    Slides the rectangles of a box towards the origin, alternately to the left and down, until none of them can move anymore.
+    The rectangles are moved in the given order, which should start with the ones closest to the origin, 
+    so they make room for the ones behind them. Boxes with overlapping rectangles are left unchanged.
+
+    Args:
+        container_size (int): size of the box
+        items_x, items_y (np.array): int32 positions of the rectangles, updated in place
+        items_width, items_height (np.array): int32 dimensions of the rectangles
+        order (np.array): indices of the rectangles in the order they are moved
+
+    Returns:
+        bool: True if any rectangle was moved
+    """
+    n = len(items_x)
+    occupancy_grid = np.zeros((container_size, container_size), dtype=np.uint8)
+    for i in range(n):
+        x, y, w, h = items_x[i], items_y[i], items_width[i], items_height[i]
+        if np.any(occupancy_grid[x:x + w, y:y + h]):
+            return False
+        occupancy_grid[x:x + w, y:y + h] = 1
+
+    moved = False
+    changed = True
+    while changed:
+        changed = False
+        for i in order:
+            x, y, w, h = items_x[i], items_y[i], items_width[i], items_height[i]
+            start_x, start_y = x, y
+
+            # slide left column by column, then down row by row
+            while x > 0 and not np.any(occupancy_grid[x - 1, y:y + h]):
+                occupancy_grid[x + w - 1, y:y + h] = 0
+                occupancy_grid[x - 1, y:y + h] = 1
+                x -= 1
+            while y > 0 and not np.any(occupancy_grid[x:x + w, y - 1]):
+                occupancy_grid[x:x + w, y + h - 1] = 0
+                occupancy_grid[x:x + w, y - 1] = 1
+                y -= 1
+
+            if x != start_x or y != start_y:
+                items_x[i], items_y[i] = x, y
+                changed = True
+                moved = True
+
+    return moved
+
+@njit(nogil=True)
 def compute_overlap_numba(x1, y1, w1, h1, x2, y2, w2, h2):
     """
     Fast overlap computation using Numba JIT compilation
@@ -102,7 +496,7 @@ def compute_overlap_numba(x1, y1, w1, h1, x2, y2, w2, h2):
     y_overlap = max(0, min(y1 + h1, y2 + h2) - max(y1, y2))
     return x_overlap * y_overlap
 
-@njit
+@njit(nogil=True)
 def copy_numpy_array(array):
     """
     Quickly copies a NumPy array using numba.
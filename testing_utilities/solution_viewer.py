@@ -1,9 +1,110 @@
 import json
+import threading
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog
 import random
 import rectangle_packer_classes.problem_classes
 from base_classes.ui_classes import GUI
+from rectangle_packer_classes.archive import ARCHIVE_EXTENSION, ArchiveReader, is_archive
+
+class JsonSolutionReader:
+    """
+    Index over the solutions of a JSON solution file of the test environment, with the same interface as ArchiveReader.
+    The record id of a solution is its position in the file, it is only turned into a RecPac_Solution when requested.
+    The JSON file itself is parsed completely when it is opened, so large result files should be written as archives (.rpk),
+    which are indexed without reading their solutions.
+    """
+    def __init__(self, data: dict):
+        self.records = data["solutions"]
+        self.box_length = int(data["box_length"])
+
+    def __len__(self):
+        return len(self.records)
+
+    def metadata(self, index: int):
+        metadata = {key: value for key, value in self.records[index].items() if key not in ("boxes", "interim_solutions")}
+        return {**metadata, "kind": "solution"}
+
+    def solution(self, index: int):
+        # Create RecPac_Solution object for visualization
+        current_solution = rectangle_packer_classes.problem_classes.RecPac_Solution()
+        for box in self.records[index].get("boxes", []):
+            current_box = rectangle_packer_classes.problem_classes.Box(self.box_length)
+            for rectangle in box:
+                current_box.add_item(rectangle_packer_classes.problem_classes.Rectangle(rectangle["x"], rectangle["y"], rectangle["w"], rectangle["h"], rectangle["color"]))
+            current_solution.add_box(current_box)
+        return current_solution
+
+
+class SolutionCache:
+    """
+    Sequence of the solutions of a reader, that creates a solution only when it is accessed.
+    The last accessed solutions are kept in a small LRU cache for stepping back and forth,
+    and single solutions can be prefetched by a background thread.
+
+    Attributes:
+        reader (ArchiveReader | JsonSolutionReader): source of the solutions
+        record_ids (list[int]): record of the reader for every solution index
+        capacity (int): maximum number of cached solutions
+    """
+    def __init__(self, reader, record_ids, capacity: int = 5):
+        self.reader = reader
+        self.record_ids = record_ids
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.pending = {} # index -> future of a running prefetch
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self):
+        return len(self.record_ids)
+
+    def __getitem__(self, index: int):
+        with self.lock:
+            if index in self.cache:
+                self.cache.move_to_end(index)
+                return self.cache[index]
+            future = self.pending.get(index)
+        # wait for a running prefetch instead of creating the solution twice
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                # a failed prefetch is retried on this thread, so its error is raised where the solution is needed
+                pass
+        return self.load(index)
+
+    def load(self, index: int):
+        """Creates the solution at the index and adds it to the cache."""
+        try:
+            solution = self.reader.solution(self.record_ids[index])
+        finally:
+            # a failed prefetch is dropped as well, so the next access creates the solution again
+            with self.lock:
+                self.pending.pop(index, None)
+        with self.lock:
+            self.cache[index] = solution
+            self.cache.move_to_end(index)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+        return solution
+
+    def prefetch(self, index: int):
+        """Creates the solution at the index in the background, if it is not cached yet.
+        The index is clamped to the solutions, like the steps of the viewer."""
+        if not self.record_ids:
+            return
+        index = min(max(index, 0), len(self.record_ids) - 1)
+        with self.lock:
+            if index in self.cache or index in self.pending:
+                return
+            self.pending[index] = self.executor.submit(self.load, index)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 
 class SolutionViewer(GUI):
     """
@@ -18,6 +119,7 @@ class SolutionViewer(GUI):
         self.rectangle_colors = {}
         
         self.step_size = 1
+        self.step_direction = 1
         self.current_index = 0
         self.zoom_factor = 1.0
         self.zoom_steps = 0
@@ -29,37 +131,27 @@ class SolutionViewer(GUI):
     
     def parse_solutions(self):
         """
-        Parses the loaded solutions from the JSON file.
-        Handles the new structure from the updated TestEnvironment.
+        Indexes the loaded solutions from the JSON file or rectangle archive.
+        Only the metadata is read here, the solutions are created when they are displayed (see SolutionCache).
         """
-        solutionsRaw = self.solutionsRaw["solutions"]
-        box_length = int(self.solutionsRaw["box_length"])
+        reader = self.solutionsRaw
+        if not isinstance(reader, ArchiveReader):
+            reader = JsonSolutionReader(self.solutionsRaw)
         
-        # each solution prase
-        for solution in solutionsRaw:
-            # Get metadata, with defaults
-            algorithm = solution.get("algorithm", "Unknown Algorithm")
-            strategy = solution.get("strategy", "No Strategy")
-            neighborhood = solution.get("neighborhood", "No Neighborhood")
-            
-            # Access boxes directly
-            boxes = solution.get("boxes", [])
+        record_ids = []
+        for record_id in range(len(reader)):
+            metadata = reader.metadata(record_id)
+            if metadata.get("kind") != "solution":
+                continue
+            record_ids.append(record_id)
             
-            # Create RecPac_Solution object for visualization
-            current_solution = rectangle_packer_classes.problem_classes.RecPac_Solution()
-            for box in boxes:
-                current_box = rectangle_packer_classes.problem_classes.Box(box_length)
-                for rectangle in box:
-                    current_box.add_item(rectangle_packer_classes.problem_classes.Rectangle(rectangle["x"], rectangle["y"], rectangle["w"], rectangle["h"], rectangle["color"]))
-                current_solution.add_box(current_box)
-            
-            # Store parsed solution and metadata
-            self.solutions.append(current_solution)
+            # Get metadata, with defaults
             self.solutionsalgorithms.append({
-                "algorithm": algorithm,
-                "strategy": strategy,
-                "neighborhood": neighborhood
+                "algorithm": metadata.get("algorithm", "Unknown Algorithm"),
+                "strategy": metadata.get("strategy", "No Strategy"),
+                "neighborhood": metadata.get("neighborhood", "No Neighborhood")
             })
+        self.solutions = SolutionCache(reader, record_ids)
     
     def setup_ui(self):
         """
@@ -128,11 +220,13 @@ class SolutionViewer(GUI):
 
     def jump_to_start(self):
         self.current_index = 0
+        self.step_direction = 1
         self.update_labels()
         self.redraw_canvas()
         
     def jump_to_end(self):
         self.current_index = len(self.solutions)-1
+        self.step_direction = -1
         self.update_labels()
         self.redraw_canvas()
 
@@ -144,6 +238,7 @@ class SolutionViewer(GUI):
         new_index = max(0, self.current_index - self.step_size)
         if new_index != self.current_index:
             self.current_index = new_index
+            self.step_direction = -1
             self.update_labels()
             self.redraw_canvas()
 
@@ -175,6 +270,7 @@ class SolutionViewer(GUI):
         new_index = min(len(self.solutions) - 1, self.current_index + self.step_size)
         if new_index != self.current_index:
             self.current_index = new_index
+            self.step_direction = 1
             self.update_labels()
             self.redraw_canvas()
 
@@ -235,6 +331,9 @@ class SolutionViewer(GUI):
             x_offset += scaled_box_length + box_padding
 
         self.update_scrollregion()
+        
+        # the next solution in the current stepping direction is created while the user looks at this one
+        self.solutions.prefetch(self.current_index + self.step_direction * self.step_size)
     
     def zoom_in(self):
         if self.zoom_steps < self.max_zoom_steps:
@@ -257,8 +356,10 @@ class SolutionViewer(GUI):
     
     @staticmethod
     def load_solutions():
-        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
+        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json"), ("Rechteck-Archiv", "*" + ARCHIVE_EXTENSION)])
         if file_path:
+            if is_archive(file_path):
+                return ArchiveReader(file_path)
             with open(file_path, "r", encoding="utf-8") as file:
                 return json.load(file)
         return {}
@@ -268,3 +369,4 @@ if __name__ == "__main__":
     solutions = SolutionViewer.load_solutions()
     app = SolutionViewer(root, solutions)
     root.mainloop()
+    app.solutions.close()
@@ -5,8 +5,13 @@ from datetime import datetime
 import os
 
 from base_classes.algorithms import Greedy, LocalSearch, Backtracking, SimulatedAnnealing
-from rectangle_packer_classes.helpers import apply_greedy_strategy, generate_instances, GreedyStrategy, Neighborhoods, merge_geometry_based_solutions, get_neighborhood_and_start_solution, quick_copy
-from rectangle_packer_classes.problem_classes import Box, RecPac_Solution, RectanglePacker
+from rectangle_packer_classes.helpers import apply_greedy_strategy, fast_greedy, generate_instances, GreedyStrategy, Neighborhoods, merge_geometry_based_solutions, get_neighborhood_and_start_solution, quick_copy
+from rectangle_packer_classes.problem_classes import Box, RecPac_Solution, RectanglePacker, PlacementPolicy
+from rectangle_packer_classes.neighborhoods import AdaptiveNeighborhood
+from rectangle_packer_classes.archive import ARCHIVE_EXTENSION, ArchiveWriter, archive_to_json, solution_to_columns
+
+# colors of the rectangles in the viewer, chosen by their area
+VIEWER_COLORS = ["red", "green", "blue", "yellow", "purple", "orange", "cyan"]
 
 class TestEnvironment:
     """
@@ -15,17 +20,20 @@ class TestEnvironment:
     def __init__(self):
         self.box_length = -1
         self.max_iterations = 21
+        self.num_neighbors = 1 # neighbors per local search iteration, the best one is taken
+        self.max_workers = None # threads for the neighbors, one per neighbor by default
+        self.placement_policy = PlacementPolicy.FIRST_FIT # box selection of all algorithms
         self.instances = []
+        self.viewer_file_format = "rpk" # "rpk" for a rectangle archive, "json" for the previous JSON file
         
-        self.greedy_solutions = []
-        self.local_search_solutions = []
-        self.backtracking_solutions = []
-        self.sim_annealing_solutions = []
-        
-        self.times_greedy = []
-        self.times_local_search = []
-        self.times_backtracking = []
-        self.times_sim_annealing = []
+        # results are streamed to disk after every run: protocol records as JSON Lines, solutions into an archive
+        self.run_id = None
+        self.test_date = None
+        self.records_path = None
+        self.solutions_path = None
+        self.records_file = None
+        self.archive_writer = None
+        self.record_counts = {}
 
     def run(self):
         """
@@ -34,22 +42,101 @@ class TestEnvironment:
         and Backtracking & Simulated Annealing once.
         """
         print("\nRunning All Tests...")
+        self.start_streams()
         
-        # Run greedy with all strategies
-        self.run_greedy()
+        try:
+            # Run greedy with all strategies
+            self.run_greedy()
+            
+            # Run local search with all neighborhoods
+            self.run_local_search()
+            
+            # Run backtracking
+            self.run_backtracking()
+            
+            # Run simulated annealing
+            self.run_simulated_annealing()
+        finally:
+            # everything up to a crash is already on disk
+            self.close_streams()
         
-        # Run local search with all neighborhoods
-        self.run_local_search()
+        # Create protocol and solution file from the streamed results
+        self.create_protocol()
+        self.extract_solutions_for_viewer()
+
+    def start_streams(self):
+        """
+        Opens the JSON Lines file for the protocol records and the archive for the solutions of a new test run.
+        """
+        os.makedirs("protocols", exist_ok=True)
+        os.makedirs("viewer_solutions", exist_ok=True)
         
-        # Run backtracking
-        self.run_backtracking()
+        self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.test_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.records_path = f"protocols/protocol_{self.run_id}.jsonl"
+        self.solutions_path = f"viewer_solutions/solutions_{self.run_id}{ARCHIVE_EXTENSION}"
+        self.records_file = open(self.records_path, "w", encoding="utf-8")
+        self.archive_writer = ArchiveWriter(self.solutions_path, self.box_length)
+        self.record_counts = {}
+
+    def close_streams(self):
+        """
+        Closes the files of the test run.
+        """
+        if self.records_file is not None:
+            self.records_file.close()
+            self.records_file = None
+        if self.archive_writer is not None:
+            self.archive_writer.close()
+            self.archive_writer = None
+
+    def record_result(self, algorithm_name, solution, run_time, strategy=None, neighborhood=None, operator_stats=None, stats=None):
+        """
+        Appends the protocol record and the solution of a finished run to the files of the test run,
+        so the solution does not have to be kept in memory.
+
+        Args:
+            algorithm_name (str): name of the algorithm
+            solution (RecPac_Solution): solution of the run
+            run_time (float): run time in seconds
+            strategy (str, optional): greedy strategy
+            neighborhood (str, optional): neighborhood of the local search
+            operator_stats (dict, optional): statistics of an adaptive neighborhood
+            stats (dict, optional): counters and timers of the solver
+        """
+        if self.records_file is None:
+            self.start_streams()
+        if isinstance(solution, tuple):
+            solution = solution[0]  # if its a tuple take first value
         
-        # Run simulated annealing
-        self.run_simulated_annealing()
+        # instances are numbered per algorithm
+        self.record_counts[algorithm_name] = self.record_counts.get(algorithm_name, 0) + 1
         
-        # Save all solutions and create protocol
-        self.create_protocol()
-        self.extract_solutions_for_viewer()
+        record = {
+            "algorithm": algorithm_name,
+            "instance": self.record_counts[algorithm_name],
+            "num_boxes": len(solution.boxes),
+            "time": run_time,
+            # calculate area utilization
+            "utilization": [self.calculate_covered_area(box) for box in solution.boxes],
+            "strategy": strategy,
+            "neighborhood": neighborhood,
+            "operator_stats": operator_stats,
+            "stats": stats
+        }
+        self.records_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records_file.flush()
+        
+        # consistent viewer colors by the area of the rectangles
+        columns, _, num_boxes = solution_to_columns(solution)
+        columns[4] = (columns[2] * columns[3]) % len(VIEWER_COLORS)
+        self.archive_writer.write_record(columns, num_boxes, {
+            "kind": "solution",
+            "colors": VIEWER_COLORS,
+            "algorithm": algorithm_name,
+            "strategy": strategy,
+            "neighborhood": neighborhood
+        })
 
     def run_greedy(self):
         """
@@ -60,25 +147,21 @@ class TestEnvironment:
             for i, instance_set in enumerate(self.instances):
                 start_time = time.time()
                 instance_set_copy = copy.deepcopy(instance_set)
-                instance_set_copy = apply_greedy_strategy(instance_set_copy, strategy.value)
-                
-                problem = RectanglePacker(instance_set_copy, self.box_length)
-                solver = Greedy(problem, RecPac_Solution, apply_greedy_strategy, strategy.value, True)
-                solution, interim_solutions = solver.solve()
+                problem = RectanglePacker(instance_set_copy, self.box_length, self.placement_policy)
+                solver = Greedy(problem, RecPac_Solution, apply_greedy_strategy, strategy.value, True, instrument=True)
+                solution, _ = solver.solve()
                 
-                self.times_greedy.append(time.time() - start_time)
-                self.greedy_solutions.append({
-                    "strategy": strategy.value,
-                    "solution": solution,
-                    "interim_solutions": interim_solutions
-                })
+                self.record_result("Greedy", solution, time.time() - start_time, strategy=strategy.value, stats=solver.stats.as_dict())
         print("\nGreedy Algorithm Completed.")
 
     def greedy_runner(self, items, container_size, strategy_name):
         """
         Greedy runner method that will be utilized by others for start solutions.
+        With first fit the compiled fast path is used, it places the rectangles exactly like the greedy algorithm.
         """
-        problem = RectanglePacker(items, container_size)
+        if self.placement_policy == PlacementPolicy.FIRST_FIT:
+            return fast_greedy(items, container_size, strategy_name), []
+        problem = RectanglePacker(items, container_size, self.placement_policy)
         greedy_solver = Greedy(problem, RecPac_Solution, apply_greedy_strategy, strategy_name, True)
         solution, interim_solutions = greedy_solver.solve()
         return solution, interim_solutions
@@ -91,22 +174,20 @@ class TestEnvironment:
         for neighborhood in Neighborhoods:
             for i, instance_set in enumerate(self.instances):
                 instance_set_copy = copy.deepcopy(instance_set)
-                problem = RectanglePacker(instance_set_copy, self.box_length)
+                problem = RectanglePacker(instance_set_copy, self.box_length, self.placement_policy)
                 
                 if neighborhood.value == Neighborhoods.GEOMETRY.value:
                     start_solution, neighborhood_strategy = merge_geometry_based_solutions(problem, neighborhood.value, instance_set_copy, self.box_length, "", self.greedy_runner)
                 else:
                     start_solution, neighborhood_strategy = get_neighborhood_and_start_solution(problem, neighborhood.value, instance_set_copy, self.box_length, "", self.greedy_runner)
                 
-                solver = LocalSearch(problem, start_solution, self.max_iterations, neighborhood_strategy, True)
+                solver = LocalSearch(problem, start_solution, self.max_iterations, neighborhood_strategy, True, self.num_neighbors, self.max_workers, instrument=True)
                 start_time = time.time()
                 solution = solver.solve()
                 
-                self.times_local_search.append(time.time() - start_time)
-                self.local_search_solutions.append({
-                    "neighborhood": neighborhood.value,
-                    "solution": solution
-                })
+                self.record_result("Local Search", solution, time.time() - start_time, neighborhood=neighborhood.value,
+                                   operator_stats=neighborhood_strategy.operator_stats() if isinstance(neighborhood_strategy, AdaptiveNeighborhood) else None,
+                                   stats=solver.stats.as_dict())
         print("\nLocal Search Completed.")
 
     def run_backtracking(self):
@@ -114,16 +195,15 @@ class TestEnvironment:
         Runs the backtracking algorithm on all instances.
         """
         print("\nStarting Backtracking...")
-        for i, instance_set in enumerate(copy.deepcopy(self.instances)):
-            problem = RectanglePacker(instance_set, self.box_length)
-            solver = Backtracking(problem, RecPac_Solution, True)
+        for i, instance_set in enumerate(self.instances):
+            # copy one instance at a time, so the memory does not grow with the number of instances
+            instance_set = copy.deepcopy(instance_set)
+            problem = RectanglePacker(instance_set, self.box_length, self.placement_policy)
+            solver = Backtracking(problem, RecPac_Solution, True, instrument=True)
             start_time = time.time()
             solution = solver.solve()
             
-            self.times_backtracking.append(time.time() - start_time)
-            self.backtracking_solutions.append({
-                "solution": solution
-            })
+            self.record_result("Backtracking", solution, time.time() - start_time, stats=solver.stats.as_dict())
         print("\nBacktracking Completed.")
 
     def run_simulated_annealing(self):
@@ -131,8 +211,9 @@ class TestEnvironment:
         Runs the simulated annealing algorithm on all instances.
         """
         print("\nStarting Simulated Annealing...")
-        for i, instance_set in enumerate(copy.deepcopy(self.instances)):
-            problem = RectanglePacker(instance_set, self.box_length)
+        for i, instance_set in enumerate(self.instances):
+            instance_set = copy.deepcopy(instance_set)
+            problem = RectanglePacker(instance_set, self.box_length, self.placement_policy)
             start_solution, neighborhood = merge_geometry_based_solutions(problem, Neighborhoods.GEOMETRY.value, instance_set, self.box_length, "", self.greedy_runner)
             
             solver = SimulatedAnnealing(
@@ -143,15 +224,13 @@ class TestEnvironment:
                 cooling_rate=0.95,
                 iterations_per_temp=10,
                 neighborhood_strategy=neighborhood,
-                in_test_env=True
+                in_test_env=True,
+                instrument=True
             )
             start_time = time.time()
             solution = solver.solve()
             
-            self.times_sim_annealing.append(time.time() - start_time)
-            self.sim_annealing_solutions.append({
-                "solution": solution
-            })
+            self.record_result("Simulated Annealing", solution, time.time() - start_time, stats=solver.stats.as_dict())
         print("\nSimulated Annealing Completed.")
 
     def generate_instances(self, instance_count, rectangle_count, min_width, min_height, max_width, max_height):        
@@ -177,49 +256,26 @@ class TestEnvironment:
 
     def create_protocol(self):
         """
-        Creates a detailed JSON protocol for all test results.
+        Creates a detailed JSON protocol for all test results from the streamed protocol records.
         Organized by algorithm, strategy, neighborhood, and instance.
         """
-        if not os.path.exists("protocols"):
-            os.makedirs("protocols")
-        
         # json protocol output structure
         protocol_data = {
-            "test_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "test_date": self.test_date,
             "box_length": self.box_length,
+            "placement_policy": self.placement_policy.value,
             "instances": len(self.instances),
             "rectangles_per_instance": len(self.instances[0]),
             "algorithms": []
         }
         
-        def add_protocol_data(solutions, times, algorithm_name):
-            for i, solution_dict in enumerate(solutions):
-                solution = solution_dict["solution"]
-                if isinstance(solution, tuple):
-                    solution = solution[0]  # if its a tuple take first value
-                
-                # calculate area utilization
-                utilization = [self.calculate_covered_area(box) for box in solution.boxes]
-
-                # save data
-                protocol_data["algorithms"].append({
-                    "algorithm": algorithm_name,
-                    "instance": i + 1,
-                    "num_boxes": len(solution.boxes),
-                    "time": times[i],
-                    "utilization": utilization,
-                    "strategy": solution_dict.get("strategy"),
-                    "neighborhood": solution_dict.get("neighborhood")
-                })
-        
-        # make a protocol for all solutions for each algorithm
-        add_protocol_data(self.greedy_solutions, self.times_greedy, "Greedy")
-        add_protocol_data(self.local_search_solutions, self.times_local_search, "Local Search")
-        add_protocol_data(self.backtracking_solutions, self.times_backtracking, "Backtracking")
-        add_protocol_data(self.sim_annealing_solutions, self.times_sim_annealing, "Simulated Annealing")
+        with open(self.records_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    protocol_data["algorithms"].append(json.loads(line))
         
         # save in json file
-        file_name = f"protocols/protocol_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        file_name = f"protocols/protocol_{self.run_id}.json"
         with open(file_name, "w", encoding="utf-8") as f:
             json.dump(protocol_data, f, indent=4, ensure_ascii=False)
         
@@ -227,69 +283,17 @@ class TestEnvironment:
 
     def extract_solutions_for_viewer(self):
         """
-        Extracts solutions for the solution viewer.
-        Organized by algorithm, strategy, and neighborhood.
+        Provides the solutions for the solution viewer. They have already been streamed into a rectangle archive (.rpk),
+        which is converted into the previous JSON file if viewer_file_format is "json".
         """
-        if not os.path.exists("viewer_solutions"):
-            os.makedirs("viewer_solutions")
-        
-        viewer_data = {
-            "box_length": self.box_length,
-            "solutions": []
-        }
-        
-        def generate_color(rect):
-            """
-            Generates a consistent color for each rectangle.
-            """
-            color_choices = ["red", "green", "blue", "yellow", "purple", "orange", "cyan"]
-            return color_choices[(rect.width * rect.height) % len(color_choices)]
-        
-        def add_viewer_data(solutions, algorithm_name):
-            for solution_dict in solutions:
-                solution = solution_dict["solution"]
-                interim_solutions = solution_dict.get("interim_solutions", [])
-                if isinstance(solution, tuple):
-                    solution = solution[0]  # Get the first element if it's a tuple
-                
-                # Extract metadata
-                solution_metadata = {
-                    "algorithm": algorithm_name,
-                    "strategy": solution_dict.get("strategy"),
-                    "neighborhood": solution_dict.get("neighborhood"),
-                    "boxes": [],
-                    "interim_solutions": []
-                }
-                
-                # Extract the final solution
-                for box in solution.boxes:
-                    box_data = []
-                    for rect in box.items:
-                        box_data.append({
-                            "x": int(rect.x),
-                            "y": int(rect.y),
-                            "w": int(rect.width),
-                            "h": int(rect.height),
-                            "color": generate_color(rect)
-                        })
-                    solution_metadata["boxes"].append(box_data)
-                
-                viewer_data["solutions"].append(solution_metadata)
-        
-        # Extract data for all algorithms
-        add_viewer_data(self.greedy_solutions, "Greedy")
-        add_viewer_data(self.local_search_solutions, "Local Search")
-        add_viewer_data(self.backtracking_solutions, "Backtracking")
-        add_viewer_data(self.sim_annealing_solutions, "Simulated Annealing")
-        
-        # Save the extracted data
-        file_name = f"viewer_solutions/solutions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(file_name, "w", encoding="utf-8") as f:
-            json.dump(viewer_data, f, indent=4, ensure_ascii=False)
+        file_name = self.solutions_path
+        if self.viewer_file_format == "json":
+            file_name = f"viewer_solutions/solutions_{self.run_id}.json"
+            archive_to_json(self.solutions_path, file_name)
+            os.remove(self.solutions_path)
         
         print(f"Solutions extracted for viewer at: {file_name}")
 
-
 if __name__ == "__main__":
     test_env = TestEnvironment()
     test_env.box_length = 250